@@ -1,28 +1,55 @@
+import asyncio
+import contextvars
+import time
+from collections import Counter
 from pathlib import Path
 
 import discord
 from discord.ext import commands
 
 import config
+from core.audit import AuditLogCache
+from core.bans import BanCache
 from core.constants import DEFAULT_PREFIX
 from core.context import CustomContext
+from core.cooldowns import acquire_cooldown
+from core.menus import MenuStore, PaginatorButton
+from core.metrics import BotMetrics
+from core.permissions import PermissionResolver
+from core.tree import CommandTree
+
+
+_loading_extension = contextvars.ContextVar("_loading_extension", default=None)
 
 
 async def determine_prefix(bot, message):
     if not message.guild:
         return commands.when_mentioned_or(DEFAULT_PREFIX)(bot, message)
 
-    query = {"_id": message.guild.id}
-    entry = await bot.mongo.db.guild.find_one_and_update(
-        query, {"$setOnInsert": query}, upsert=True, return_document=True
-    )
+    prefix = bot.mongo.get_prefix(message.guild.id)
+    if prefix is None:
+        prefix = await bot.mongo.fetch_prefix(message.guild.id)
 
-    prefix = entry.get("prefix", DEFAULT_PREFIX)
     return commands.when_mentioned_or(prefix)(bot, message)
 
 
-class Bot(commands.Bot):
-    def __init__(self):
+def member_cache_flags(spec):
+    if spec == "all":
+        return discord.MemberCacheFlags.all()
+
+    flags = discord.MemberCacheFlags.none()
+    for name in filter(None, map(str.strip, spec.split(","))):
+        if name != "none":
+            setattr(flags, name, True)
+    return flags
+
+
+class Bot(commands.AutoShardedBot):
+    commands_version = 0
+
+    def __init__(
+        self, *, cluster_id=0, cluster_count=1, shard_ids=None, shard_count=None
+    ):
         super().__init__(
             determine_prefix,
             intents=discord.Intents.all(),
@@ -31,27 +58,157 @@ class Bot(commands.Bot):
             ),
             case_insensitive=True,
             strip_after_prefix=True,
+            member_cache_flags=member_cache_flags(config.MEMBER_CACHE_FLAGS),
+            chunk_guilds_at_startup=config.CHUNK_GUILDS_AT_STARTUP,
+            max_messages=config.MAX_MESSAGES,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            tree_cls=CommandTree,
         )
 
         self.config = config
+        self.cluster_id = cluster_id
+        self.cluster_count = cluster_count
+        self.before_invoke(self.prepare_command)
+        self.after_invoke(self.finish_command)
+        self.metrics = BotMetrics(self)
+        self.message_filter_stats = Counter()
+        self.permissions = PermissionResolver(self)
+        self.permissions.register_listeners()
+        self.audit_logs = AuditLogCache(self)
+        self.audit_logs.register_listeners()
+        self.bans = BanCache(self)
+        self.bans.register_listeners()
+        self.menus = MenuStore(self)
+        self.extension_load_times = {}
+        self.extension_wait_times = {}
+        self._extensions_loaded = {}
 
     @property
     def mongo(self):
         return self.get_cog("Mongo")
 
+    @property
+    def timers(self):
+        return self.get_cog("Timers")
+
     @property
     def redis(self):
-        return self.get_cog("Redis")._pool
+        return self.get_cog("Redis").client
+
+    @property
+    def ipc(self):
+        return self.get_cog("Cluster").ipc
 
     async def setup_hook(self):
-        for file in Path("cogs").glob("*.py"):
-            name = f"cogs.{file.stem}"
+        self.add_dynamic_items(PaginatorButton)
+
+        names = [f"cogs.{file.stem}" for file in Path("cogs").glob("*.py")]
+        self._extensions_loaded = {name: asyncio.Event() for name in names}
+
+        # Extensions load concurrently; each one's setup() waits on the
+        # extensions it depends on through wait_for_extensions.
+        await asyncio.gather(*map(self._load_extension_timed, names))
+
+        for name, seconds in sorted(
+            self.extension_load_times.items(), key=lambda x: x[1], reverse=True
+        ):
+            waited = self.extension_wait_times.get(name, 0)
+            print(
+                f"Loaded {name} in {seconds * 1000:.0f} ms "
+                f"(waited {waited * 1000:.0f} ms for dependencies)"
+            )
+
+    async def _load_extension_timed(self, name):
+        # Each load runs in its own task, so the context variable tells
+        # wait_for_extensions which extension's wait time to record.
+        _loading_extension.set(name)
+        start = time.perf_counter()
+        try:
             await self.load_extension(name)
+        finally:
+            elapsed = time.perf_counter() - start
+            waited = self.extension_wait_times.get(name, 0)
+            self.extension_load_times[name] = elapsed - waited
+            self._extensions_loaded[name].set()
+
+    async def wait_for_extensions(self, *names):
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self._extensions_loaded[name].wait()
+                for name in names
+                if name in self._extensions_loaded
+            )
+        )
+
+        if (loading := _loading_extension.get()) is not None:
+            self.extension_wait_times[loading] = (
+                self.extension_wait_times.get(loading, 0) + time.perf_counter() - start
+            )
+
+    async def prepare_command(self, ctx):
+        self.metrics.command_prepared(ctx)
+        await acquire_cooldown(ctx)
+
+        # Commands that need the full member list opt in with
+        # extras={"chunk_members": True} instead of chunking every guild.
+        if (
+            ctx.guild is not None
+            and ctx.command.extras.get("chunk_members")
+            and not ctx.guild.chunked
+        ):
+            if ctx.interaction is not None:
+                await ctx.defer()
+            await ctx.guild.chunk()
+
+    async def finish_command(self, ctx):
+        self.metrics.command_finished(ctx)
+
+    def add_command(self, command, /):
+        super().add_command(command)
+        self.commands_version += 1
+
+    def remove_command(self, name, /):
+        command = super().remove_command(name)
+        if command is not None:
+            self.commands_version += 1
+        return command
+
+    def is_command_candidate(self, message):
+        content = message.content
+        if not content:
+            return False
+
+        if message.guild is None:
+            prefix = DEFAULT_PREFIX
+        else:
+            prefix = self.mongo.get_prefix(message.guild.id)
+            if prefix is None:
+                return True
+
+        return content.startswith((prefix, f"<@{self.user.id}>", f"<@!{self.user.id}>"))
+
+    async def process_commands(self, message):
+        if message.author.bot:
+            return
+
+        if not self.is_command_candidate(message):
+            self.message_filter_stats["dropped"] += 1
+            return
+
+        self.message_filter_stats["passed"] += 1
+        await super().process_commands(message)
 
     async def get_context(self, origin, /, *, cls=CustomContext):
         return await super().get_context(origin, cls=cls)
 
 
 if __name__ == "__main__":
-    bot = Bot()
-    bot.run(config.BOT_TOKEN)
+    if config.CLUSTER_COUNT > 1:
+        import launcher
+
+        launcher.main()
+    else:
+        bot = Bot()
+        bot.run(config.BOT_TOKEN)
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import sys
 import traceback
@@ -5,7 +6,9 @@ import traceback
 import discord
 from discord.ext import commands
 
+from core.constants import MEMBER_QUERY_BATCH_SIZE
 from core.enums import EmbedStyle
+from core.menus import CodeBlockTablePageSource, Paginator
 from core.utils import human_timedelta
 
 
@@ -67,6 +70,64 @@ class Basic(commands.Cog):
         seconds = (message.created_at - ctx.message.created_at).total_seconds()
         await message.edit(content=f"Pong! **{seconds * 1000:.0f} ms**")
 
+    async def resolve_names(self, guild, user_ids):
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            if (member := guild.get_member(user_id)) is not None:
+                names[user_id] = str(member)
+            else:
+                missing.append(user_id)
+
+        # Only members about to be shown are requested, and they aren't cached,
+        # so showing a leaderboard doesn't pull the whole guild into memory.
+        if missing:
+            try:
+                members = await guild.query_members(user_ids=missing, cache=False)
+            except asyncio.TimeoutError:
+                members = []
+            names.update((member.id, str(member)) for member in members)
+
+        return names
+
+    async def iter_leaderboard_names(self, guild):
+        async def resolve(batch):
+            names = await self.resolve_names(guild, [user_id for user_id, _ in batch])
+            return [
+                (names.get(user_id, str(user_id)), level) for user_id, level in batch
+            ]
+
+        batch = []
+        async for entry in self.bot.get_cog("Redis").iter_leaderboard(guild.id):
+            batch.append(entry)
+            if len(batch) >= MEMBER_QUERY_BATCH_SIZE:
+                for entry in await resolve(batch):
+                    yield entry
+                batch = []
+
+        for entry in await resolve(batch):
+            yield entry
+
+    @commands.hybrid_command()
+    @commands.guild_only()
+    async def leaderboard(self, ctx):
+        """Shows the members with the highest levels in this server."""
+
+        await ctx.defer()
+
+        def format_entry(entry):
+            name, level = entry
+            return (name, str(level))
+
+        source = CodeBlockTablePageSource(
+            self.iter_leaderboard_names(ctx.guild),
+            color=0xFE9AC9,
+            title=f"{ctx.guild.name} Leaderboard",
+            icon_url=ctx.guild.icon and ctx.guild.icon.url,
+            format_entry=format_entry,
+        )
+        await Paginator(source).start(ctx)
+
     @discord.app_commands.command()
     async def help(self, interaction, *, command: str = None):
         """Shows all available commands.
@@ -96,16 +157,25 @@ class Basic(commands.Cog):
     @help.autocomplete("command")
     async def help_command_autocomplete(self, interaction, current):
         context = await self.bot.get_context(interaction)
+        index = self.bot.help_index.ensure()
         options = await self.bot.help_command.filter_commands(
-            self.bot.commands, context=context
+            index.commands, context=context, sort=False
         )
-        choices = [
-            discord.app_commands.Choice(name=option.name, value=option.name)
-            for option in options
-            if current.casefold() in option.name.casefold()
+        visible = {option.qualified_name for option in options}
+
+        def predicate(target):
+            if isinstance(target, commands.Cog):
+                cmds = target.get_commands()
+            else:
+                cmds = (target,)
+            return any(cmd.qualified_name in visible for cmd in cmds)
+
+        return [
+            discord.app_commands.Choice(name=name, value=name)
+            for name, _ in index.names.search(current, predicate=predicate)
         ]
-        return choices[:25]
 
 
 async def setup(bot):
+    await bot.wait_for_extensions("cogs.mongo", "cogs.redis")
     await bot.add_cog(Basic(bot))
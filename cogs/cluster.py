@@ -0,0 +1,44 @@
+from discord.ext import commands
+
+from core.ipc import ClusterIPC
+
+
+class Cluster(commands.Cog):
+    """For communicating with other clusters."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.ipc = ClusterIPC(bot)
+        self.ipc.add_handler("stats", self.stats)
+        self.ipc.add_handler("reload_extension", self.reload_extension)
+        self.ipc.add_handler("invalidate", self.invalidate)
+        self._task = self.bot.loop.create_task(self.connect())
+
+    async def connect(self):
+        await self.bot.wait_until_ready()
+        await self.ipc.start(self.bot.redis)
+
+    async def cog_unload(self):
+        self._task.cancel()
+        await self.ipc.close()
+
+    async def stats(self):
+        return {
+            "shards": {
+                shard_id: round(latency * 1000)
+                for shard_id, latency in self.bot.latencies
+            },
+            "guilds": len(self.bot.guilds),
+            "users": len(self.bot.users),
+        }
+
+    async def reload_extension(self, name):
+        await self.bot.reload_extension(name)
+
+    async def invalidate(self, cache, key=None):
+        self.bot.dispatch("cluster_invalidate", cache, key)
+
+
+async def setup(bot):
+    await bot.wait_for_extensions("cogs.redis")
+    await bot.add_cog(Cluster(bot))
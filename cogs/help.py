@@ -1,16 +1,132 @@
+import asyncio
+import copy
 import datetime
 import inspect
 import re
+from dataclasses import dataclass
 
 import discord
 from discord.ext import commands
 
+from core.cache import TTLCache
+from core.constants import (
+    HELP_CHECK_CONCURRENCY,
+    HELP_EMBED_CACHE_SIZE,
+    HELP_EMBED_CACHE_TTL,
+    HELP_FILTER_CACHE_SIZE,
+    HELP_FILTER_CACHE_TTL,
+)
 from core.enums import EmbedStyle
 from core.menus import HelpPageSource, Paginator
+from core.search import NameIndex
 from core.utils import human_timedelta
 
 
+EXAMPLES_REGEX = re.compile(r"Examples\s*[\n-]+\s*(.*?)(?=Parameters|\Z)", re.DOTALL)
+
+
+def get_examples(cmd):
+    docstring = inspect.getdoc(cmd.callback)
+    if not docstring:
+        return None
+
+    return "\n".join(EXAMPLES_REGEX.findall(docstring))
+
+
+def get_command_signature(cmd):
+    parents = []
+    parent = cmd.parent
+    while parent is not None:
+        if not parent.signature or parent.invoke_without_command:
+            parents.append(parent.name)
+        else:
+            parents.append(f"{parent.name} {parent.signature}")
+        parent = parent.parent
+
+    name = f"[{cmd.name}|{'|'.join(cmd.aliases)}]" if cmd.aliases else cmd.name
+    return " ".join([*reversed(parents), name, cmd.signature]).rstrip()
+
+
+@dataclass(frozen=True, slots=True)
+class HelpEntry:
+    signature: str
+    summary: str
+    aliases: str
+    cooldown: str
+    examples: str
+
+    @classmethod
+    def from_command(cls, cmd):
+        cooldown = None
+        if cmd.cooldown:
+            cooldown = human_timedelta(
+                datetime.timedelta(seconds=cmd.cooldown.per / cmd.cooldown.rate)
+            )
+
+        return cls(
+            signature=get_command_signature(cmd),
+            summary=cmd.help.splitlines()[0] if cmd.help else "No help found...",
+            aliases=" ".join([f"`{alias}`" for alias in cmd.aliases]) or None,
+            cooldown=cooldown,
+            examples=get_examples(cmd) or None,
+        )
+
+
+class HelpIndex:
+    def __init__(self, bot):
+        self.bot = bot
+        self.version = None
+        self.commands = []
+        self.entries = {}
+        self.mapping = []
+        self.names = NameIndex([])
+        self._embeds = TTLCache(
+            maxsize=HELP_EMBED_CACHE_SIZE, ttl=HELP_EMBED_CACHE_TTL, name="help_embeds"
+        )
+
+    def ensure(self):
+        if self.version != self.bot.commands_version:
+            self.rebuild()
+        return self
+
+    def rebuild(self):
+        self.commands = list(self.bot.walk_commands())
+        self.entries = {
+            cmd.qualified_name: HelpEntry.from_command(cmd) for cmd in self.commands
+        }
+        self.mapping = [
+            (cog, sorted(cog.get_commands(), key=lambda c: c.name))
+            for cog in self.bot.cogs.values()
+        ]
+        self.names = NameIndex(self._iter_names())
+        self._embeds.clear()
+        self.version = self.bot.commands_version
+
+    def _iter_names(self):
+        for cmd in self.commands:
+            yield cmd.qualified_name, cmd
+            for alias in cmd.aliases:
+                yield f"{cmd.full_parent_name} {alias}".lstrip(), cmd
+
+        for cog in self.bot.cogs.values():
+            yield cog.qualified_name, cog
+
+    def embed(self, key, build):
+        embed = self._embeds.get(key)
+        if embed is None:
+            embed = build()
+            self._embeds.set(key, embed)
+        return embed.copy()
+
+
 class CustomHelpCommand(commands.HelpCommand):
+    # Shared across the copies discord.py makes for each invocation.
+    _visibility_cache = TTLCache(
+        maxsize=HELP_FILTER_CACHE_SIZE,
+        ttl=HELP_FILTER_CACHE_TTL,
+        name="help_visibility",
+    )
+
     def __init__(self):
         super().__init__(command_attrs={"help": "Shows all available commands."})
 
@@ -36,17 +152,31 @@ class CustomHelpCommand(commands.HelpCommand):
         if self.verify_checks is None and not context.guild:
             return sorted(iterator, key=key) if sort else list(iterator)
 
+        # Checks can depend on the channel (NSFW, channel permissions), so
+        # results are only reused within the same channel.
+        cache_key = (context.author.id, context.channel.id)
+        visible = self._visibility_cache.get(cache_key)
+        if visible is None:
+            visible = {}
+            self._visibility_cache.set(cache_key, visible)
+
+        semaphore = asyncio.Semaphore(HELP_CHECK_CONCURRENCY)
+
         async def predicate(cmd):
-            try:
-                return await cmd.can_run(context)
-            except commands.CommandError:
-                return False
+            # can_run swaps ctx.command while it awaits the checks, so
+            # concurrent checks each need their own context.
+            async with semaphore:
+                try:
+                    return await cmd.can_run(copy.copy(context))
+                except commands.CommandError:
+                    return False
+
+        cmds = list(iterator)
+        pending = [cmd for cmd in cmds if cmd.qualified_name not in visible]
+        results = await asyncio.gather(*map(predicate, pending))
+        visible.update(zip((cmd.qualified_name for cmd in pending), results))
 
-        ret = []
-        for cmd in iterator:
-            valid = await predicate(cmd)
-            if valid:
-                ret.append(cmd)
+        ret = [cmd for cmd in cmds if visible[cmd.qualified_name]]
 
         if sort:
             ret.sort(key=key)
@@ -58,6 +188,14 @@ class CustomHelpCommand(commands.HelpCommand):
         embed = self.context.response_embed(error, style=EmbedStyle.FAILURE)
         await self.context.reply(embed=embed, ephemeral=True)
 
+    @property
+    def index(self):
+        return self.context.bot.help_index.ensure()
+
+    def get_command_signature(self, command):
+        entry = self.index.entries[command.qualified_name]
+        return f"{self.context.clean_prefix}{entry.signature}"
+
     def _prepare_embed(self, cmds, *, title, description):
         embed = discord.Embed(color=0xFE9AC9, title=title, description=description)
         embed.set_footer(
@@ -66,25 +204,19 @@ class CustomHelpCommand(commands.HelpCommand):
 
         for cmd in cmds:
             name = self.get_command_signature(cmd)
-            help = cmd.help.splitlines()[0] if cmd.help else "No help found..."
-            embed.add_field(name=name, value=f"`{help}`", inline=False)
+            summary = self.index.entries[cmd.qualified_name].summary
+            embed.add_field(name=name, value=f"`{summary}`", inline=False)
 
         return embed
 
     def get_examples(self, cmd):
-        docstring = inspect.getdoc(cmd.callback)
-        if not docstring:
-            return None
-
-        pattern = r"Examples\s*[\n-]+\s*(.*?)(?=Parameters|\Z)"
-        matches = re.findall(pattern, docstring, re.DOTALL)
-        return "\n".join(matches)
+        return self.index.entries[cmd.qualified_name].examples
 
     async def send_bot_help(self, mapping):
         entries = []
-        for cog, cmds in mapping.items():
-            cmds = await self.filter_commands(cmds)
-            if cog and len(cmds) > 0:
+        for cog, cmds in self.index.mapping:
+            cmds = await self.filter_commands(cmds, sort=False)
+            if len(cmds) > 0:
                 entries.append((cog, cmds))
 
         paginator = Paginator(
@@ -98,10 +230,19 @@ class CustomHelpCommand(commands.HelpCommand):
         if len(cmds) == 0:
             return await self.send_error_message(cog.qualified_name, modify=True)
 
-        embed = self._prepare_embed(
-            cmds,
-            title=f"{cog.qualified_name} Commands",
-            description=cog.description or "No Description",
+        key = (
+            "cog",
+            cog.qualified_name,
+            self.context.clean_prefix,
+            tuple(cmd.qualified_name for cmd in cmds),
+        )
+        embed = self.index.embed(
+            key,
+            lambda: self._prepare_embed(
+                cmds,
+                title=f"{cog.qualified_name} Commands",
+                description=cog.description or "No Description",
+            ),
         )
         await self.context.reply(embed=embed)
 
@@ -114,18 +255,26 @@ class CustomHelpCommand(commands.HelpCommand):
         if len(cmds) == 0:
             return await self.send_error_message(group.qualified_name, modify=True)
 
-        embed = self._prepare_embed(
-            cmds,
-            title=self.get_command_signature(group),
-            description=(
-                group.help.splitlines()[0] if group.help else "No help found..."
-            ),
-        )
+        def build():
+            entry = self.index.entries[group.qualified_name]
+            embed = self._prepare_embed(
+                cmds,
+                title=self.get_command_signature(group),
+                description=entry.summary,
+            )
 
-        if examples := self.get_examples(group):
-            embed.description += "\n\n" + "**Examples**" + "\n" + examples
+            if entry.examples:
+                embed.description += "\n\n" + "**Examples**" + "\n" + entry.examples
 
-        await self.context.reply(embed=embed)
+            return embed
+
+        key = (
+            "group",
+            group.qualified_name,
+            self.context.clean_prefix,
+            tuple(cmd.qualified_name for cmd in cmds),
+        )
+        await self.context.reply(embed=self.index.embed(key, build))
 
     async def send_command_help(self, command):
         try:
@@ -136,35 +285,36 @@ class CustomHelpCommand(commands.HelpCommand):
         if not valid:
             return await self.send_error_message(command.name, modify=True)
 
-        embed = discord.Embed(
-            color=0xFE9AC9,
-            title=f"{self.context.clean_prefix}{command.name} {command.signature}",
-            description=(
-                command.help.splitlines()[0] if command.help else "No help found..."
-            ),
-        )
+        def build():
+            entry = self.index.entries[command.qualified_name]
+            embed = discord.Embed(
+                color=0xFE9AC9,
+                title=f"{self.context.clean_prefix}{command.name} {command.signature}",
+                description=entry.summary,
+            )
 
-        if aliases := command.aliases:
-            value = " ".join([f"`{alias}`" for alias in aliases])
-            embed.add_field(name="Aliases", value=value, inline=False)
+            if entry.aliases:
+                embed.add_field(name="Aliases", value=entry.aliases, inline=False)
 
-        if cooldown := command.cooldown:
-            value = human_timedelta(
-                datetime.timedelta(seconds=cooldown.per / cooldown.rate)
-            )
-            embed.add_field(name="Cooldown", value=value, inline=False)
+            if entry.cooldown:
+                embed.add_field(name="Cooldown", value=entry.cooldown, inline=False)
 
-        if examples := self.get_examples(command):
-            embed.add_field(name="Examples", value=examples, inline=False)
+            if entry.examples:
+                embed.add_field(name="Examples", value=entry.examples, inline=False)
 
-        await self.context.reply(embed=embed)
+            return embed
+
+        key = ("command", command.qualified_name, self.context.clean_prefix)
+        await self.context.reply(embed=self.index.embed(key, build))
 
 
 async def setup(bot):
     bot.old_help_command = bot.help_command
     bot.help_command = CustomHelpCommand()
+    bot.help_index = HelpIndex(bot)
 
 
 async def teardown(bot):
     bot.help_command = bot.old_help_command
     del bot.old_help_command
+    del bot.help_index
@@ -1,11 +1,36 @@
-from PIL import Image
-from io import BytesIO
+import asyncio
+import hashlib
+import re
+import sys
+import tempfile
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path, PurePosixPath
 
+import aiohttp
 import discord
 from discord.ext import commands
 
+from core.cache import TTLCache
 from core.checks import is_manager
-from core.constants import DEFAULT_PREFIX
+from core.constants import (
+    DOWNLOAD_CHUNK_SIZE,
+    EMOJI_ARCHIVE_MAX_MEMBERS,
+    EMOJI_CACHE_SIZE,
+    EMOJI_CACHE_TTL,
+    EMOJI_MAX_UPLOAD_BYTES,
+    IMAGE_EXTENSIONS,
+    IMAGE_WORKERS,
+)
+from core.cooldowns import distributed_cooldown
+from core.utils import Plural
+
+
+def emoji_name(filename):
+    name = re.sub(r"\W", "_", PurePosixPath(filename).stem)[:32]
+    return name + "_" if len(name) == 1 else name
 
 
 class Manager(commands.Cog):
@@ -13,6 +38,106 @@ class Manager(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self._executor = None
+        self._images = None
+        self._emojis = TTLCache(
+            maxsize=EMOJI_CACHE_SIZE, ttl=EMOJI_CACHE_TTL, name="emojis"
+        )
+
+    def cog_unload(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def images(self):
+        # PIL and the worker pool are only paid for once an image is handled.
+        if self._images is None:
+            from core import images
+
+            self._images = images
+        return self._images
+
+    async def run_image_job(self, func, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+
+        try:
+            return await self.bot.loop.run_in_executor(self._executor, func, *args)
+        except (self.images.InvalidImage, self.images.ImageTooLarge) as e:
+            raise commands.BadArgument(str(e))
+        except OSError:
+            raise commands.BadArgument("This image is corrupted or truncated.")
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; start a new one next time.
+            self._executor = None
+            raise commands.BadArgument("Failed to process this image.")
+
+    async def process_image(self, data, format):
+        key = hashlib.sha256(data).digest()
+        return await self._emojis.get_or_fetch(
+            key, lambda: self.run_image_job(self.images.process_emoji, data, format)
+        )
+
+    async def _download(self, attachment, path):
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(attachment.url) as response:
+                    response.raise_for_status()
+                    with open(path, "wb") as f:
+                        async for chunk in response.content.iter_chunked(
+                            DOWNLOAD_CHUNK_SIZE
+                        ):
+                            f.write(chunk)
+        except aiohttp.ClientError:
+            raise commands.BadArgument(f"Failed to download `{attachment.filename}`.")
+
+    async def _prepare_archive_jobs(self, attachment, directory):
+        path = Path(directory, f"{attachment.id}.zip")
+        await self._download(attachment, path)
+
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [
+                    (member, IMAGE_EXTENSIONS[suffix])
+                    for member in archive.infolist()
+                    if not member.is_dir()
+                    and (suffix := PurePosixPath(member.filename).suffix.lower())
+                    in IMAGE_EXTENSIONS
+                ]
+        except zipfile.BadZipFile:
+            raise commands.BadArgument(
+                f"`{attachment.filename}` is not a valid zip file."
+            )
+
+        if len(members) > EMOJI_ARCHIVE_MAX_MEMBERS:
+            raise commands.BadArgument(
+                f"Archives can contain at most {EMOJI_ARCHIVE_MAX_MEMBERS} images."
+            )
+
+        jobs = []
+        for member, format in members:
+            name = emoji_name(member.filename)
+            if member.file_size > EMOJI_MAX_UPLOAD_BYTES:
+                jobs.append((name, None, "This file is too large to be processed."))
+            else:
+                job = self.run_image_job(
+                    self.images.process_archive_member, path, member.filename, format
+                )
+                jobs.append((name, asyncio.ensure_future(job), None))
+
+        return jobs
+
+    async def _prepare_attachment_job(self, attachment):
+        name = emoji_name(attachment.filename)
+        format = (attachment.content_type or "").partition("/")[2]
+
+        if format not in ("gif", "jpeg", "png"):
+            return name, None, "Unsupported file format."
+        if attachment.size > EMOJI_MAX_UPLOAD_BYTES:
+            return name, None, "This file is too large to be processed."
+
+        job = self.process_image(await attachment.read(), format)
+        return name, asyncio.ensure_future(job), None
 
     async def cog_check(self, ctx):
         return await is_manager().predicate(ctx)
@@ -28,13 +153,12 @@ class Manager(commands.Cog):
         """
 
         if prefix is None:
-            entry = await self.bot.mongo.db.guild.find_one({"_id": ctx.guild.id})
-            valid = entry.get("prefix", DEFAULT_PREFIX) if entry else DEFAULT_PREFIX
+            valid = await self.bot.mongo.fetch_prefix(ctx.guild.id)
             await ctx.reply(f"My current prefix is `{valid}` in this server.")
 
         else:
-            await self.bot.mongo.db.guild.update_one(
-                {"_id": ctx.guild.id}, {"$set": {"prefix": prefix}}, upsert=True
+            await self.bot.mongo.update_guild(
+                ctx.guild.id, {"$set": {"prefix": prefix}}
             )
             await ctx.reply(f"Changed prefix to `{prefix}` for this server.")
 
@@ -50,36 +174,126 @@ class Manager(commands.Cog):
 
         await ctx.defer()
 
-        name = file.filename.split(".")[0][:32]
-        type = file.content_type.split("/")[1]
-
-        if len(name) == 1:
-            name += "_"
+        name = emoji_name(file.filename)
+        type = (file.content_type or "").partition("/")[2]
 
-        try:
-            if type == "gif":
-                bytes = await file.read()
-                emoji = await ctx.guild.create_custom_emoji(name=name, image=bytes)
+        if type not in ("gif", "jpeg", "png"):
+            raise commands.BadArgument(
+                "Unsupported file format. Please attach an image file in JPEG, PNG, or GIF format."
+            )
 
-            elif type in ("jpeg", "png"):
-                image = Image.open(BytesIO(await file.read()))
-                image = image.resize((128, 128))
+        if file.size > EMOJI_MAX_UPLOAD_BYTES:
+            raise commands.BadArgument("This file is too large to be processed.")
 
-                with BytesIO() as buffer:
-                    image.save(buffer, type)
-                    buffer.seek(0)
-                    bytes = buffer.getvalue()
-                    emoji = await ctx.guild.create_custom_emoji(name=name, image=bytes)
+        _, image = await self.process_image(await file.read(), type)
 
-            else:
-                raise commands.BadArgument(
-                    "Unsupported file format. Please attach an image file in JPEG, PNG, or GIF format."
-                )
+        try:
+            emoji = await ctx.guild.create_custom_emoji(name=name, image=image)
         except discord.HTTPException as e:
             raise commands.BadArgument(e.text)
 
         await ctx.reply(f"**{ctx.author}** uploaded {emoji}")
 
+    @commands.hybrid_command()
+    @distributed_cooldown(1, 60, commands.BucketType.guild)
+    async def upload_emojis(self, ctx, file: discord.Attachment):
+        """Upload emojis in bulk from a zip archive or several attached files.
+
+        Parameters
+        -----------
+        file: `Attachment`
+            A zip archive of images, or the first of several image files.
+        """
+
+        await ctx.defer()
+
+        attachments = {file.id: file}
+        if ctx.interaction is None:
+            attachments.update((a.id, a) for a in ctx.message.attachments)
+
+        animated_count = sum(emoji.animated for emoji in ctx.guild.emojis)
+        slots = {
+            False: ctx.guild.emoji_limit - (len(ctx.guild.emojis) - animated_count),
+            True: ctx.guild.emoji_limit - animated_count,
+        }
+        uploaded, failed = [], []
+
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = []
+            try:
+                for attachment in attachments.values():
+                    try:
+                        if attachment.filename.lower().endswith(".zip"):
+                            jobs += await self._prepare_archive_jobs(
+                                attachment, directory
+                            )
+                        else:
+                            jobs.append(await self._prepare_attachment_job(attachment))
+                    except commands.BadArgument as e:
+                        failed.append((attachment.filename, str(e)))
+
+                # Images are processed in parallel on the worker pool, while
+                # uploads go out one at a time to stay within the rate limit.
+                for name, job, error in jobs:
+                    if job is None:
+                        failed.append((name, error))
+                        continue
+
+                    try:
+                        format, image = await job
+                    except commands.BadArgument as e:
+                        failed.append((name, str(e)))
+                        continue
+                    except Exception as e:
+                        # One bad file shouldn't hide the emojis already uploaded.
+                        traceback.print_exception(
+                            type(e), e, e.__traceback__, file=sys.stderr
+                        )
+                        failed.append((name, "Failed to process this file."))
+                        continue
+
+                    animated = format == "gif"
+                    if slots[animated] <= 0:
+                        failed.append((name, "No emoji slots left."))
+                        continue
+
+                    try:
+                        emoji = await ctx.guild.create_custom_emoji(
+                            name=name, image=image
+                        )
+                    except discord.HTTPException as e:
+                        if e.code == 30008:  # Maximum number of emojis reached
+                            slots[animated] = 0
+                        failed.append((name, e.text))
+                        continue
+
+                    slots[animated] -= 1
+                    uploaded.append(emoji)
+            finally:
+                for _, job, _ in jobs:
+                    if job is not None:
+                        job.cancel()
+
+        embed = ctx.response_embed(
+            f"**{ctx.author}** uploaded {Plural(len(uploaded)):emoji}."
+        )
+        if uploaded:
+            value = ""
+            for i, emoji in enumerate(uploaded):
+                if len(value) + len(str(emoji)) > 1000:
+                    value += f"...and {len(uploaded) - i} more"
+                    break
+                value += f"{emoji} "
+            embed.add_field(name="Uploaded", value=value, inline=False)
+        if failed:
+            value = "\n".join(f"`{name}`: {error}" for name, error in failed[:15])
+            if len(failed) > 15:
+                value += f"\n...and {len(failed) - 15} more"
+            embed.add_field(name="Failed", value=value[:1024], inline=False)
+
+        await ctx.reply(embed=embed)
+
 
 async def setup(bot):
+    await bot.wait_for_extensions("cogs.mongo", "cogs.redis")
     await bot.add_cog(Manager(bot))
@@ -0,0 +1,44 @@
+from aiohttp import web
+from discord.ext import commands
+
+
+class Metrics(commands.Cog):
+    """For exposing bot metrics."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._runner = None
+
+    async def cog_load(self):
+        if not self.bot.config.METRICS_PORT:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        # Each cluster is its own process, so each one listens on its own port.
+        port = self.bot.config.METRICS_PORT + self.bot.cluster_id
+        site = web.TCPSite(self._runner, self.bot.config.METRICS_HOST, port)
+        await site.start()
+
+    async def cog_unload(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            text=self.bot.metrics.registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx, error):
+        if not isinstance(error, commands.CommandNotFound):
+            self.bot.metrics.command_errored(ctx, error)
+
+
+async def setup(bot):
+    await bot.add_cog(Metrics(bot))
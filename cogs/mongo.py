@@ -1,6 +1,66 @@
+import asyncio
+from collections import deque
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, monitoring
+from pymongo.errors import OperationFailure, PyMongoError
+from redis.backoff import ExponentialBackoff
+
+from discord.ext import commands, tasks
+
+from core.cache import DictCache, TTLCache
+from core.constants import (
+    DEFAULT_PREFIX,
+    GUILD_CACHE_POLL_INTERVAL,
+    MEMBER_LEVEL_CACHE_SIZE,
+    MEMBER_LEVEL_CACHE_TTL,
+    SLOW_QUERY_REPORT_INTERVAL,
+    SLOW_QUERY_THRESHOLD,
+)
+from core.migrations import legacy_member_id, migrate_member_ids
+
+
+INDEXES = {
+    "member": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("user_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"user_id": {"$exists": True}},
+        ),
+        IndexModel([("guild_id", ASCENDING), ("level", DESCENDING)]),
+    ],
+    "timer": [
+        IndexModel([("expires_at", ASCENDING)]),
+    ],
+}
+
+EXPLAINABLE_COMMANDS = {"count", "delete", "find", "update"}
+
 
-from discord.ext import commands
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.slow_queries = deque(maxlen=100)
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            self._started[event.request_id] = event.command
+
+    def succeeded(self, event):
+        command = self._started.pop(event.request_id, None)
+        if command is not None and event.duration_micros / 1e6 >= self.threshold:
+            self.slow_queries.append(
+                (
+                    event.database_name,
+                    event.command_name,
+                    command,
+                    event.duration_micros,
+                )
+            )
+
+    def failed(self, event):
+        self._started.pop(event.request_id, None)
 
 
 class Mongo(commands.Cog):
@@ -8,12 +68,92 @@ class Mongo(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self._client = AsyncIOMotorClient(bot.config.DATABASE_URI, tz_aware=True)
+        self._listener = SlowQueryListener(SLOW_QUERY_THRESHOLD)
+        self._client = AsyncIOMotorClient(
+            bot.config.DATABASE_URI, tz_aware=True, event_listeners=[self._listener]
+        )
+        self._guilds = DictCache(name="guilds")
+        self._member_levels = TTLCache(
+            maxsize=MEMBER_LEVEL_CACHE_SIZE,
+            ttl=MEMBER_LEVEL_CACHE_TTL,
+            name="member_levels",
+        )
+        self._members_migrated = asyncio.Event()
+        self._task = self.bot.loop.create_task(self.watch_guilds())
+        self._index_task = self.bot.loop.create_task(self.ensure_indexes())
+        self._migration_task = self.bot.loop.create_task(self.ensure_members_migrated())
+        self.report_slow_queries.start()
 
     @property
     def db(self):
         return self._client[self.bot.config.DATABASE_NAME]
 
+    def cog_unload(self):
+        self._task.cancel()
+        self._index_task.cancel()
+        self._migration_task.cancel()
+        self.poll_guilds.cancel()
+        self.report_slow_queries.cancel()
+
+    async def ensure_indexes(self):
+        for collection, indexes in INDEXES.items():
+            try:
+                await self.db[collection].create_indexes(indexes)
+            except OperationFailure as e:
+                print(f"Failed to create indexes on {collection}: {e}")
+
+    async def migrate_members(self):
+        migrated = await migrate_member_ids(self.db)
+        self._member_levels.clear()
+        return migrated
+
+    async def ensure_members_migrated(self):
+        backoff = ExponentialBackoff()
+        failures = 0
+
+        while True:
+            try:
+                migrated = await self.migrate_members()
+                break
+            except PyMongoError as e:
+                print(f"Failed to migrate member documents, retrying: {e}")
+                await asyncio.sleep(backoff.compute(failures))
+                failures += 1
+
+        # The owner command can run while this task is still going, so only
+        # this task marks the migration as finished.
+        self._members_migrated.set()
+        if migrated:
+            print(f"Migrated {migrated} member documents")
+
+    async def wait_for_member_migration(self):
+        await self._members_migrated.wait()
+
+    @tasks.loop(seconds=SLOW_QUERY_REPORT_INTERVAL)
+    async def report_slow_queries(self):
+        queries = self._listener.slow_queries
+        while queries:
+            database, name, command, duration = queries.popleft()
+
+            # Only report slow queries whose winning plan is a collection scan.
+            command = {
+                k: v
+                for k, v in command.items()
+                if not k.startswith("$") and k not in ("lsid", "txnNumber")
+            }
+            try:
+                plan = await self._client[database].command(
+                    "explain", command, verbosity="queryPlanner"
+                )
+            except PyMongoError:
+                continue
+
+            if "COLLSCAN" in str(plan.get("queryPlanner", {}).get("winningPlan")):
+                print(
+                    f"Slow unindexed {name} on {database}.{command[name]} "
+                    f"({duration / 1000:.0f} ms): {command}"
+                )
+
     async def reserve_id(self, name, reserve=1):
         entry = await self.db.counter.find_one_and_update(
             {"_id": name},
@@ -23,6 +163,145 @@ class Mongo(commands.Cog):
         )
         return entry["next"]
 
+    async def fetch_guild(self, guild_id):
+        try:
+            return self._guilds[guild_id]
+        except KeyError:
+            pass
+
+        query = {"_id": guild_id}
+        entry = await self.db.guild.find_one_and_update(
+            query, {"$setOnInsert": query}, upsert=True, return_document=True
+        )
+        self._guilds[guild_id] = entry
+        return entry
+
+    async def update_guild(self, guild_id, update):
+        entry = await self.db.guild.find_one_and_update(
+            {"_id": guild_id},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._guilds[guild_id] = entry
+        return entry
+
+    async def fetch_prefix(self, guild_id):
+        entry = await self.fetch_guild(guild_id)
+        return entry.get("prefix", DEFAULT_PREFIX)
+
+    def get_prefix(self, guild_id):
+        entry = self._guilds.lookup(guild_id)
+        return None if entry is None else entry.get("prefix", DEFAULT_PREFIX)
+
+    async def fetch_member_level(self, guild_id, user_id):
+        async def fetch():
+            query = {"guild_id": guild_id, "user_id": user_id}
+
+            # Until the startup migration finishes, a member may still only
+            # exist under the old embedded _id.
+            if not self._members_migrated.is_set():
+                query = {"$or": [query, {"_id": legacy_member_id(guild_id, user_id)}]}
+
+            entry = await self.db.member.find_one(query, {"level": 1})
+            return None if entry is None else entry.get("level", 0)
+
+        return await self._member_levels.get_or_fetch((guild_id, user_id), fetch)
+
+    async def update_member(self, guild_id, user_id, update):
+        if not self._members_migrated.is_set():
+            await migrate_member_ids(
+                self.db, query={"_id": legacy_member_id(guild_id, user_id)}
+            )
+
+        entry = await self.db.member.find_one_and_update(
+            {"guild_id": guild_id, "user_id": user_id},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.invalidate_member_level(guild_id, user_id)
+        if self.bot.cluster_count > 1:
+            await self.bot.ipc.notify(
+                "invalidate", cache="member_levels", key=[guild_id, user_id]
+            )
+
+        if (redis := self.bot.get_cog("Redis")) is not None and "level" in entry:
+            await redis.set_member_level(guild_id, user_id, entry["level"])
+
+        return entry
+
+    def invalidate_member_level(self, guild_id, user_id=None):
+        if user_id is None:
+            self._member_levels.invalidate_where(lambda key: key[0] == guild_id)
+        else:
+            self._member_levels.invalidate((guild_id, user_id))
+
+    @commands.Cog.listener()
+    async def on_cluster_invalidate(self, cache, key):
+        if cache == "member_levels":
+            self.invalidate_member_level(*key)
+        elif cache == "guilds":
+            if key is None:
+                self._guilds.clear()
+            else:
+                self._guilds.pop(key, None)
+
+    async def seed_guilds(self, guild_ids):
+        guild_ids = list(guild_ids)
+        entries = {guild_id: {"_id": guild_id} for guild_id in guild_ids}
+
+        async for entry in self.db.guild.find({"_id": {"$in": guild_ids}}):
+            entries[entry["_id"]] = entry
+
+        self._guilds.update(entries)
+
+    def _apply_guild_change(self, change):
+        guild_id = change["documentKey"]["_id"]
+
+        if change["operationType"] == "delete":
+            self._guilds.pop(guild_id, None)
+        elif (entry := change.get("fullDocument")) is not None:
+            self._guilds[guild_id] = entry
+
+    async def watch_guilds(self):
+        resume_token = None
+
+        while True:
+            try:
+                async with self.db.guild.watch(
+                    full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._apply_guild_change(change)
+
+            except OperationFailure:
+                # Change streams require a replica set; fall back to polling.
+                self.poll_guilds.start()
+                return
+
+            except PyMongoError:
+                await asyncio.sleep(GUILD_CACHE_POLL_INTERVAL)
+
+    @tasks.loop(seconds=GUILD_CACHE_POLL_INTERVAL)
+    async def poll_guilds(self):
+        if self._guilds:
+            await self.seed_guilds(self._guilds.keys())
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.seed_guilds(guild.id for guild in self.bot.guilds)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        await self.seed_guilds([guild.id])
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
+        self.invalidate_member_level(guild.id)
+
 
 async def setup(bot):
     await bot.add_cog(Mongo(bot))
@@ -1,5 +1,16 @@
+import hashlib
+import json
+import resource
+from collections import Counter
+
+import discord
 from discord.ext import commands
 
+from core.constants import COMMAND_SYNC_KEY
+from core.enums import EmbedStyle
+from core.menus import CursorFieldsPageSource, Paginator
+from core.utils import join_limited
+
 
 class Owner(commands.Cog):
     """For bot owners to manage the bot."""
@@ -10,14 +21,236 @@ class Owner(commands.Cog):
     async def cog_check(self, ctx):
         return await self.bot.is_owner(ctx.author)
 
+    def command_tree_hash(self, guild=None):
+        payload = [
+            command.to_dict(self.bot.tree)
+            for command in self.bot.tree.get_commands(guild=guild)
+        ]
+        payload.sort(key=lambda x: (x["type"], x["name"]))
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()
+
     @commands.hybrid_command()
-    async def sync(self, ctx):
-        """Syncs application commands with the bot."""
+    async def sync(self, ctx, force: bool = False):
+        """Syncs application commands that changed since the last sync.
+
+        Parameters
+        -----------
+        force: `bool`
+            Whether to sync every scope even if nothing changed.
+        """
+
+        await ctx.defer()
+
+        synced = await self.bot.redis.hgetall(COMMAND_SYNC_KEY)
+        synced = {k.decode(): v.decode() for k, v in synced.items()}
+
+        # Guilds that had commands synced before must be included so that
+        # removing all of their commands clears them on Discord too.
+        guild_ids = {int(k) for k in synced if k != "global"}
+        guild_ids.update(self.bot.tree.guild_ids)
+        scopes = [None, *(discord.Object(id=x) for x in sorted(guild_ids))]
+
+        uploaded, skipped, failed = [], [], []
+        for guild in scopes:
+            field = "global" if guild is None else str(guild.id)
+            digest = self.command_tree_hash(guild)
+            if not force and synced.get(field) == digest:
+                skipped.append(field)
+                continue
+
+            try:
+                items = await self.bot.tree.sync(guild=guild)
+            except discord.HTTPException as e:
+                failed.append(f"`{field}` ({e.status})")
+                continue
+
+            uploaded.append(f"`{field}` ({len(items)} commands)")
+            if guild is not None and not items:
+                await self.bot.redis.hdel(COMMAND_SYNC_KEY, field)
+            else:
+                await self.bot.redis.hset(COMMAND_SYNC_KEY, field, digest)
+
+        embed = ctx.response_embed(
+            f"Synced `{len(uploaded)}` scopes, skipped `{len(skipped)}` unchanged.",
+            style=EmbedStyle.FAILURE if failed else EmbedStyle.SUCCESS,
+        )
+        if uploaded:
+            value = join_limited(uploaded, "\n")
+            embed.add_field(name="Uploaded", value=value, inline=False)
+        if skipped:
+            value = join_limited([f"`{x}`" for x in skipped], ", ")
+            embed.add_field(name="Skipped", value=value, inline=False)
+        if failed:
+            embed.add_field(
+                name="Failed", value=join_limited(failed, "\n"), inline=False
+            )
+        await ctx.reply(embed=embed)
+
+    @commands.hybrid_command()
+    async def timers(self, ctx):
+        """Lists pending timers in the order they will fire."""
+
+        def format_entry(i, entry):
+            expires_at = discord.utils.format_dt(entry["expires_at"], "R")
+            return {
+                "name": f"{i + 1}. {entry['event']}",
+                "value": f"Fires {expires_at}",
+                "inline": False,
+            }
+
+        source = CursorFieldsPageSource(
+            self.bot.timers.collection,
+            sort=(("expires_at", 1),),
+            projection={"event": 1, "expires_at": 1},
+            color=0xFE9AC9,
+            title="Pending Timers",
+            per_page=10,
+            format_entry=format_entry,
+        )
+        await Paginator(source).start(ctx)
+
+    @commands.hybrid_command()
+    async def migrate_members(self, ctx):
+        """Migrates member documents to the indexed guild_id/user_id schema."""
+
+        await ctx.defer()
+        migrated = await self.bot.mongo.migrate_members()
+        embed = ctx.response_embed(f"Migrated `{migrated}` member documents.")
+        await ctx.reply(embed=embed)
+
+    @commands.hybrid_command()
+    async def memory(self, ctx):
+        """Shows what the bot is caching on each shard."""
+
+        guilds, members = Counter(), Counter()
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] += 1
+            members[guild.shard_id] += len(guild.members)
+
+        messages = Counter(
+            message.guild.shard_id if message.guild else None
+            for message in self.bot.cached_messages
+        )
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        embed = ctx.response_embed(
+            f"Peak memory: `{rss:.0f} MiB`, cached users: `{len(self.bot.users)}`"
+        )
+        for shard_id in sorted(self.bot.shards):
+            embed.add_field(
+                name=f"Shard {shard_id}",
+                value=(
+                    f"{guilds[shard_id]} guilds\n"
+                    f"{members[shard_id]} members\n"
+                    f"{messages[shard_id]} messages"
+                ),
+            )
+        if messages[None]:
+            embed.add_field(name="Direct Messages", value=f"{messages[None]} messages")
+
+        await ctx.reply(embed=embed)
+
+    @commands.hybrid_command()
+    async def clusters(self, ctx):
+        """Shows the shards, guilds and latency of every cluster."""
+
+        responses = await self.bot.ipc.broadcast("stats")
+
+        embed = ctx.response_embed(
+            f"`{len(responses)}/{self.bot.cluster_count}` clusters responded."
+        )
+        for cluster_id, response in responses.items():
+            if response["error"]:
+                value = f"`{response['error']}`"
+            else:
+                stats = response["result"]
+                latency = " ".join(
+                    f"`#{shard}: {ms} ms`" for shard, ms in stats["shards"].items()
+                )
+                value = f"{stats['guilds']} guilds, {stats['users']} users\n{latency}"
+            embed.add_field(name=f"Cluster {cluster_id}", value=value, inline=False)
+
+        await ctx.reply(embed=embed)
+
+    @commands.hybrid_command()
+    async def metrics(self, ctx):
+        """Shows command latency, errors and cache hit rates for this cluster."""
+
+        metrics = self.bot.metrics
+        metrics.registry.collect()
+
+        counts = Counter()
+        for (name, status), count in metrics.commands.items():
+            counts[name] += count
+
+        embed = ctx.response_embed(
+            f"`{sum(counts.values())}` commands run on cluster `{self.bot.cluster_id}`."
+        )
+
+        if counts:
+            lines = []
+            for name, count in counts.most_common(10):
+                p50 = metrics.command_duration.quantile(0.5, name)
+                p95 = metrics.command_duration.quantile(0.95, name)
+                lines.append(f"`{name}`: {count} runs, p50 ≤ {p50}s, p95 ≤ {p95}s")
+            embed.add_field(name="Commands", value="\n".join(lines), inline=False)
+
+        errors = Counter()
+        for (name, error), count in metrics.command_errors.items():
+            errors[error] += count
+        if errors:
+            embed.add_field(
+                name="Errors",
+                value="\n".join(f"`{k}`: {v}" for k, v in errors.most_common(10)),
+                inline=False,
+            )
+
+        caches = []
+        for (name,), size in metrics.cache_entries.items():
+            hits = metrics.cache_requests.get(name, "hit")
+            total = hits + metrics.cache_requests.get(name, "miss")
+            rate = f"{hits / total:.0%}" if total else "n/a"
+            caches.append(f"`{name}`: {rate} hit rate, {size} entries")
+        passed = metrics.message_filter.get("passed")
+        dropped = metrics.message_filter.get("dropped")
+        caches.append(f"Message pre-filter: {passed} passed, {dropped} dropped")
+        embed.add_field(name="Caches", value="\n".join(caches), inline=False)
+
+        latency = " ".join(
+            f"`#{shard}: {value * 1000:.0f} ms`"
+            for (shard,), value in metrics.gateway_latency.items()
+        )
+        if latency:
+            embed.add_field(name="Gateway", value=latency, inline=False)
+
+        await ctx.reply(embed=embed)
+
+    @commands.hybrid_command()
+    async def reload(self, ctx, extension: str):
+        """Reloads an extension on every cluster.
+
+        Parameters
+        -----------
+        extension: `str`
+            The extension to reload, e.g. `cogs.help`.
+        """
+
+        responses = await self.bot.ipc.broadcast("reload_extension", name=extension)
+        failed = [str(k) for k, v in responses.items() if v["error"]]
+
+        if failed or len(responses) < self.bot.cluster_count:
+            embed = ctx.response_embed(
+                f"Reloaded `{extension}` on `{len(responses) - len(failed)}/"
+                f"{self.bot.cluster_count}` clusters.",
+                style=EmbedStyle.FAILURE,
+            )
+        else:
+            embed = ctx.response_embed(f"Reloaded `{extension}` on every cluster.")
 
-        items = await self.bot.tree.sync()
-        embed = ctx.response_embed(f"Synced `{len(items)}` commands globally.")
         await ctx.reply(embed=embed)
 
 
 async def setup(bot):
+    await bot.wait_for_extensions("cogs.mongo", "cogs.redis", "cogs.timers")
     await bot.add_cog(Owner(bot))
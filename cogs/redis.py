@@ -1,30 +1,196 @@
-import aioredis
+import asyncio
+
+from redis.asyncio import ConnectionPool, Redis as RedisClient
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 
 from discord.ext import commands
 
+from core.constants import LEADERBOARD_BATCH_SIZE
+
+
+def leaderboard_key(guild_id):
+    return f"leaderboard:{guild_id}"
+
+
+class TrackingConnectionPool(ConnectionPool):
+    # Counts connections itself instead of reading the pool's private lists,
+    # which change between redis-py releases.
+
+    def reset(self):
+        self.created_connections = 0
+        self.in_use_connections = 0
+        super().reset()
+
+    def make_connection(self):
+        self.created_connections += 1
+        return super().make_connection()
+
+    async def get_connection(self, *args, **kwargs):
+        connection = await super().get_connection(*args, **kwargs)
+        self.in_use_connections += 1
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        self.in_use_connections -= 1
+
 
 class Redis(commands.Cog):
     """For redis operations."""
 
     def __init__(self, bot):
         self.bot = bot
-        self._pool = None
-        self._task = self.bot.loop.create_task(self.connect())
+        self._pool = TrackingConnectionPool.from_url(
+            bot.config.REDIS_URI,
+            password=bot.config.REDIS_PASSWORD,
+            max_connections=bot.config.REDIS_MAX_CONNECTIONS,
+            health_check_interval=bot.config.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=bot.config.REDIS_SOCKET_TIMEOUT,
+            retry=Retry(ExponentialBackoff(), bot.config.REDIS_RETRIES),
+            retry_on_error=[ConnectionError, TimeoutError],
+        )
+        self._client = RedisClient(connection_pool=self._pool)
+        self._scripts = {}
+        self._task = None
 
-    async def connect(self):
-        await self.bot.wait_until_ready()
-        self._pool = await aioredis.create_redis_pool(self.bot.config.REDIS_URI)
+    async def cog_load(self):
+        backoff = ExponentialBackoff()
+
+        for attempt in range(self.bot.config.REDIS_RETRIES + 1):
+            try:
+                await self._client.ping()
+                break
+            except (ConnectionError, TimeoutError):
+                if attempt == self.bot.config.REDIS_RETRIES:
+                    raise
+                await asyncio.sleep(backoff.compute(attempt))
+
+        self._task = self.bot.loop.create_task(self.ensure_leaderboards())
+
+    async def cog_unload(self):
+        if self._task is not None:
+            self._task.cancel()
+
+        await self._client.aclose()
+        await self._pool.disconnect()
+
+    @property
+    def client(self):
+        return self._client
+
+    def pool_stats(self):
+        return {
+            "max": self._pool.max_connections,
+            "created": self._pool.created_connections,
+            "available": (
+                self._pool.created_connections - self._pool.in_use_connections
+            ),
+            "in_use": self._pool.in_use_connections,
+        }
+
+    def script(self, source):
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self._client.register_script(source)
+        return script
+
+    def pipeline(self, *, transaction=False):
+        return self._client.pipeline(transaction=transaction)
 
-    async def close(self):
-        if self._pool is None:
+    async def mget(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        return dict(zip(keys, await self._client.mget(keys)))
+
+    async def mset(self, mapping, *, ex=None):
+        if not mapping:
+            return
+
+        if ex is None:
+            await self._client.mset(mapping)
             return
 
-        self._pool.close()
-        await self._pool.wait_closed()
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            await pipe.execute()
+
+    async def ensure_leaderboards(self):
+        await self.bot.wait_until_ready()
+
+        if not await self._client.exists("leaderboard:loaded"):
+            await self.rebuild_leaderboards()
+
+    async def rebuild_leaderboards(self):
+        await self.bot.mongo.wait_for_member_migration()
+
+        cursor = self.bot.mongo.db.member.find(
+            {"level": {"$exists": True}}, {"guild_id": 1, "user_id": 1, "level": 1}
+        )
+
+        async with self.pipeline() as pipe:
+            pending = 0
+            async for entry in cursor:
+                key = leaderboard_key(entry["guild_id"])
+                pipe.zadd(key, {entry["user_id"]: entry["level"]})
+                pending += 1
+
+                if pending >= LEADERBOARD_BATCH_SIZE:
+                    await pipe.execute()
+                    pending = 0
+
+            pipe.set("leaderboard:loaded", 1)
+            await pipe.execute()
+
+    async def set_member_level(self, guild_id, user_id, level):
+        await self._client.zadd(leaderboard_key(guild_id), {user_id: level})
+
+    async def remove_member_level(self, guild_id, user_id):
+        await self._client.zrem(leaderboard_key(guild_id), user_id)
+
+    async def fetch_rank(self, guild_id, user_id):
+        return await self._client.zrevrank(leaderboard_key(guild_id), user_id)
+
+    async def fetch_top(self, guild_id, count=10, *, offset=0):
+        entries = await self._client.zrevrange(
+            leaderboard_key(guild_id), offset, offset + count - 1, withscores=True
+        )
+        return [(int(user_id), int(level)) for user_id, level in entries]
+
+    async def fetch_level_range(
+        self, guild_id, min_level, max_level="+inf", *, offset=None, count=None
+    ):
+        # redis-py requires start and num to be given together.
+        if count is not None and offset is None:
+            offset = 0
+        elif offset is not None and count is None:
+            count = -1
+
+        entries = await self._client.zrevrangebyscore(
+            leaderboard_key(guild_id),
+            max_level,
+            min_level,
+            start=offset,
+            num=count,
+            withscores=True,
+        )
+        return [(int(user_id), int(level)) for user_id, level in entries]
+
+    async def count_level_range(self, guild_id, min_level, max_level="+inf"):
+        key = leaderboard_key(guild_id)
+        return await self._client.zcount(key, min_level, max_level)
 
-    def cog_unload(self):
-        self.bot.loop.create_task(self.close())
+    async def iter_leaderboard(self, guild_id, *, batch_size=LEADERBOARD_BATCH_SIZE):
+        offset = 0
+        while entries := await self.fetch_top(guild_id, batch_size, offset=offset):
+            for entry in entries:
+                yield entry
+            offset += len(entries)
 
 
 async def setup(bot):
+    await bot.wait_for_extensions("cogs.mongo")
     await bot.add_cog(Redis(bot))
@@ -0,0 +1,164 @@
+import asyncio
+import datetime
+import heapq
+import sys
+import traceback
+from dataclasses import dataclass, field
+
+import discord
+from discord.ext import commands
+from pymongo import ReturnDocument
+
+from core.constants import TIMER_CLAIM_LEASE, TIMER_WINDOW, TIMER_WINDOW_SIZE
+
+
+@dataclass(slots=True)
+class Timer:
+    id: object
+    event: str
+    expires_at: datetime.datetime
+    created_at: datetime.datetime
+    data: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_entry(cls, entry):
+        return cls(
+            id=entry["_id"],
+            event=entry["event"],
+            expires_at=entry["expires_at"],
+            created_at=entry["created_at"],
+            data=entry.get("data", {}),
+        )
+
+
+class Timers(commands.Cog):
+    """For scheduling events in the future."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._heap = []
+        self._loaded_until = None
+        self._wakeup = asyncio.Event()
+        self._task = self.bot.loop.create_task(self.dispatch_timers())
+
+    def cog_unload(self):
+        self._task.cancel()
+
+    @property
+    def collection(self):
+        return self.bot.mongo.db.timer
+
+    async def create_timer(self, event, expires_at, **data):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+
+        entry = {
+            "event": event,
+            "expires_at": expires_at,
+            "created_at": discord.utils.utcnow(),
+            "data": data,
+        }
+        result = await self.collection.insert_one(entry)
+        entry["_id"] = result.inserted_id
+
+        if self._loaded_until is not None and expires_at <= self._loaded_until:
+            heapq.heappush(self._heap, (expires_at, result.inserted_id))
+            self._wakeup.set()
+
+        return Timer.from_entry(entry)
+
+    async def cancel_timer(self, timer_id):
+        # Stale heap entries are skipped when their claim finds nothing.
+        result = await self.collection.delete_one({"_id": timer_id})
+        return result.deleted_count > 0
+
+    async def _load_window(self):
+        now = discord.utils.utcnow()
+        self._loaded_until = now + datetime.timedelta(seconds=TIMER_WINDOW)
+
+        # Timers leased by another process are left out, otherwise a full
+        # window of them would be reloaded and re-claimed in a tight loop.
+        # They are picked up by a later window if the lease lapses.
+        cursor = (
+            self.collection.find(
+                {
+                    "expires_at": {"$lte": self._loaded_until},
+                    "$or": [
+                        {"claimed_until": {"$exists": False}},
+                        {"claimed_until": {"$lt": now}},
+                    ],
+                },
+                {"expires_at": 1},
+            )
+            .sort("expires_at", 1)
+            .limit(TIMER_WINDOW_SIZE)
+        )
+        self._heap = [(entry["expires_at"], entry["_id"]) async for entry in cursor]
+
+        if len(self._heap) >= TIMER_WINDOW_SIZE:
+            self._loaded_until = self._heap[-1][0]
+
+    async def _claim(self, timer_id):
+        now = discord.utils.utcnow()
+        claimed_until = now + datetime.timedelta(seconds=TIMER_CLAIM_LEASE)
+
+        # Only one process can move the lease forward, so a timer fires once;
+        # if that process dies before deleting it, the lease lapses instead.
+        return await self.collection.find_one_and_update(
+            {
+                "_id": timer_id,
+                "$or": [
+                    {"claimed_until": {"$exists": False}},
+                    {"claimed_until": {"$lt": now}},
+                ],
+            },
+            {"$set": {"claimed_until": claimed_until}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _fire(self, timer_id):
+        entry = await self._claim(timer_id)
+        if entry is None:
+            return
+
+        timer = Timer.from_entry(entry)
+        self.bot.dispatch(f"{timer.event}_timer_complete", timer)
+        await self.collection.delete_one({"_id": timer_id})
+
+    async def dispatch_timers(self):
+        await self.bot.wait_until_ready()
+
+        while True:
+            try:
+                await self._dispatch_due_timers()
+            except Exception as e:
+                print("Ignoring exception in timer dispatcher")
+                traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+                self._loaded_until = None
+                await asyncio.sleep(TIMER_WINDOW)
+
+    async def _dispatch_due_timers(self):
+        if self._loaded_until is None or discord.utils.utcnow() >= self._loaded_until:
+            await self._load_window()
+
+        self._wakeup.clear()
+        deadline = self._loaded_until
+        if self._heap:
+            deadline = min(deadline, self._heap[0][0])
+
+        delay = (deadline - discord.utils.utcnow()).total_seconds()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        while self._heap and self._heap[0][0] <= discord.utils.utcnow():
+            _, timer_id = heapq.heappop(self._heap)
+            await self._fire(timer_id)
+
+
+async def setup(bot):
+    await bot.wait_for_extensions("cogs.mongo")
+    await bot.add_cog(Timers(bot))
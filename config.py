@@ -8,3 +8,17 @@ DATABASE_NAME = os.environ["DATABASE_NAME"]
 
 REDIS_URI = os.environ["REDIS_URI"]
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", 5))
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", 1))
+
+MEMBER_CACHE_FLAGS = os.getenv("MEMBER_CACHE_FLAGS", "joined")
+CHUNK_GUILDS_AT_STARTUP = os.getenv("CHUNK_GUILDS_AT_STARTUP", "").lower() == "true"
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", 1000))
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
@@ -0,0 +1,66 @@
+import asyncio
+from collections import defaultdict, deque
+
+from .constants import (
+    AUDIT_LOG_BUFFER_SIZE,
+    AUDIT_LOG_FETCH_LIMIT,
+    AUDIT_LOG_WAIT_TIMEOUT,
+)
+from .utils import is_recent_audit_log_entry
+
+
+class AuditLogCache:
+    def __init__(self, bot, *, maxlen=AUDIT_LOG_BUFFER_SIZE):
+        self.bot = bot
+        self._entries = defaultdict(lambda: deque(maxlen=maxlen))
+        self._waiters = defaultdict(list)
+
+    def register_listeners(self):
+        self.bot.add_listener(self.on_audit_log_entry_create)
+        self.bot.add_listener(self.on_guild_remove)
+
+    async def on_audit_log_entry_create(self, entry):
+        guild_id = entry.guild.id
+        self._entries[guild_id].append(entry)
+
+        for predicate, future in self._waiters.get(guild_id, ()):
+            if not future.done() and predicate(entry):
+                future.set_result(entry)
+
+    async def on_guild_remove(self, guild):
+        self._entries.pop(guild.id, None)
+
+    def get(self, guild, *, target=None, action=None):
+        for entry in reversed(self._entries.get(guild.id, ())):
+            if is_recent_audit_log_entry(entry, target=target, action=action):
+                return entry
+        return None
+
+    async def fetch(self, guild, *, target=None, action=None):
+        async for entry in guild.audit_logs(limit=AUDIT_LOG_FETCH_LIMIT, action=action):
+            if is_recent_audit_log_entry(entry, target=target, action=action):
+                return entry
+        return None
+
+    async def wait_for(
+        self, guild, *, target=None, action=None, timeout=AUDIT_LOG_WAIT_TIMEOUT
+    ):
+        if entry := self.get(guild, target=target, action=action):
+            return entry
+
+        future = self.bot.loop.create_future()
+        waiter = (
+            lambda e: is_recent_audit_log_entry(e, target=target, action=action),
+            future,
+        )
+        self._waiters[guild.id].append(waiter)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return await self.fetch(guild, target=target, action=action)
+        finally:
+            waiters = self._waiters[guild.id]
+            waiters.remove(waiter)
+            if not waiters:
+                del self._waiters[guild.id]
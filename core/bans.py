@@ -0,0 +1,133 @@
+import asyncio
+from bisect import bisect_left, insort
+
+import discord
+
+
+class GuildBans:
+    def __init__(self):
+        self._entries = {}
+        self._names = {}
+        self._keys = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _keys_for(user):
+        return {user.name.casefold(), str(user).casefold()}
+
+    def add(self, entry):
+        self.remove(entry.user.id)
+        self._entries[entry.user.id] = entry
+
+        for key in self._keys_for(entry.user):
+            ids = self._names.get(key)
+            if ids is None:
+                ids = self._names[key] = set()
+                insort(self._keys, key)
+            ids.add(entry.user.id)
+
+    def remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return None
+
+        for key in self._keys_for(entry.user):
+            ids = self._names[key]
+            ids.discard(user_id)
+            if not ids:
+                del self._names[key]
+                del self._keys[bisect_left(self._keys, key)]
+
+        return entry
+
+    def get(self, user_id):
+        return self._entries.get(user_id)
+
+    def search(self, prefix, *, limit=25):
+        prefix = prefix.casefold()
+        results = {}
+
+        for key in self._keys[bisect_left(self._keys, prefix) :]:
+            if not key.startswith(prefix):
+                break
+            for user_id in self._names[key]:
+                results[user_id] = self._entries[user_id]
+            if len(results) >= limit:
+                break
+
+        return list(results.values())[:limit]
+
+    def find(self, argument):
+        ids = self._names.get(argument.casefold(), ())
+        entries = [self._entries[user_id] for user_id in ids]
+
+        # Only exact matches are returned; a full tag wins over a bare name.
+        for key in (str, lambda user: user.name):
+            matches = [entry for entry in entries if key(entry.user) == argument]
+            if matches:
+                return matches
+
+        return []
+
+
+class BanCache:
+    def __init__(self, bot):
+        self.bot = bot
+        self._guilds = {}
+        self._loading = {}
+        self._events = {}
+
+    def register_listeners(self):
+        self.bot.add_listener(self.on_member_ban)
+        self.bot.add_listener(self.on_member_unban)
+        self.bot.add_listener(self.on_guild_remove)
+
+    def get(self, guild):
+        return self._guilds.get(guild.id)
+
+    async def fetch(self, guild):
+        if (bans := self._guilds.get(guild.id)) is not None:
+            return bans
+
+        task = self._loading.get(guild.id)
+        if task is None:
+            task = self._loading[guild.id] = asyncio.create_task(self._load(guild))
+            task.add_done_callback(lambda _: self._loading.pop(guild.id, None))
+
+        return await asyncio.shield(task)
+
+    async def _load(self, guild):
+        # Bans and unbans that arrive while paginating may or may not be
+        # reflected in the pages already fetched, so they are replayed after.
+        events = self._events[guild.id] = []
+        try:
+            bans = GuildBans()
+            async for entry in guild.bans(limit=None):
+                bans.add(entry)
+
+            for apply in events:
+                apply(bans)
+        finally:
+            self._events.pop(guild.id, None)
+
+        self._guilds[guild.id] = bans
+        return bans
+
+    def _apply(self, guild, apply):
+        if (bans := self._guilds.get(guild.id)) is not None:
+            apply(bans)
+        elif (events := self._events.get(guild.id)) is not None:
+            events.append(apply)
+
+    async def on_member_ban(self, guild, user):
+        entry = discord.BanEntry(reason=None, user=user)
+        self._apply(guild, lambda bans: bans.add(entry))
+
+    async def on_member_unban(self, guild, user):
+        self._apply(guild, lambda bans: bans.remove(user.id))
+
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
+        self._events.pop(guild.id, None)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+caches = weakref.WeakValueDictionary()
+
+
+class TTLCache:
+    def __init__(self, *, maxsize=1024, ttl=60, name=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._pending = {}
+
+        if name is not None:
+            caches[name] = self
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key):
+        try:
+            value, expires_at = self._data[key]
+        except KeyError:
+            return _MISSING
+
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+        self._pending.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+        for key in [key for key in self._pending if predicate(key)]:
+            del self._pending[key]
+
+    def clear(self):
+        self._data.clear()
+        self._pending.clear()
+
+    async def get_or_fetch(self, key, fetch):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            task.add_done_callback(lambda t: self._resolve(key, t))
+            self._pending[key] = task
+
+        return await asyncio.shield(task)
+
+    def _resolve(self, key, task):
+        # An invalidation while the fetch was in flight drops the pending
+        # task, in which case the (possibly stale) result is not cached.
+        if self._pending.get(key) is not task:
+            return
+
+        del self._pending[key]
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+
+class DictCache(dict):
+    def __init__(self, *, name=None):
+        super().__init__()
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+        if name is not None:
+            caches[name] = self
+
+    def lookup(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
@@ -1,18 +1,31 @@
 from discord.ext import commands
 
 from . import constants
+from .enums import PermissionTier
+
+
+def has_tier(tier, message=None):
+    async def predicate(ctx):
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+
+        if tier in await ctx.bot.permissions.resolve(ctx.author):
+            return True
+        raise commands.CheckFailure(message)
+
+    return commands.check(predicate)
 
 
 def has_roles(*role_ids):
+    role_ids = frozenset(role_ids)
+
     async def predicate(ctx):
         if ctx.guild is None:
             raise commands.NoPrivateMessage()
 
-        if (
-            await ctx.bot.is_owner(ctx.author)
-            or ctx.author.id == ctx.guild.owner_id
-            or ctx.author.guild_permissions.administrator
-            or any(role.id in role_ids for role in ctx.author.roles)
+        tier = await ctx.bot.permissions.resolve(ctx.author)
+        if PermissionTier.ADMIN in tier or any(
+            role.id in role_ids for role in ctx.author.roles
         ):
             return True
         raise commands.CheckFailure()
@@ -21,33 +34,23 @@ def has_roles(*role_ids):
 
 
 def is_admin():
-    return has_roles()
+    return has_tier(PermissionTier.ADMIN)
 
 
 def is_manager():
-    return has_roles(*constants.MANAGER_ROLES)
+    return has_tier(PermissionTier.MANAGER)
 
 
 def is_moderator():
-    return has_roles(*constants.MODERATOR_ROLES)
+    return has_tier(PermissionTier.MODERATOR)
 
 
 def is_trial_moderator():
-    return has_roles(*constants.TRIAL_MODERATOR_ROLES)
+    return has_tier(PermissionTier.TRIAL_MODERATOR)
 
 
 def is_server_booster():
-    async def predicate(ctx):
-        try:
-            return await is_admin().predicate(ctx)
-        except commands.CheckFailure:
-            pass
-
-        if ctx.author.premium_since is None:
-            raise commands.CheckFailure("You are not a server booster.")
-        return True
-
-    return commands.check(predicate)
+    return has_tier(PermissionTier.BOOSTER, "You are not a server booster.")
 
 
 def in_guilds(*guild_ids):
@@ -75,12 +78,10 @@ def has_level(level):
         if ctx.guild is None:
             raise commands.NoPrivateMessage()
 
-        entry = await ctx.bot.mongo.db.member.find_one(
-            {"_id": {"id": ctx.author.id, "guild_id": ctx.guild.id}}, {"level": 1}
-        )
-        if entry is None:
+        value = await ctx.bot.mongo.fetch_member_level(ctx.guild.id, ctx.author.id)
+        if value is None:
             return False
 
-        return entry.get("level", 0) >= level
+        return value >= level
 
     return commands.check(predicate)
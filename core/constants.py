@@ -35,11 +35,76 @@ TIME_UNITS = [
 ]
 
 
-EXCLUDED_PAGINATOR_BUTTONS = [
-    "\N{BLACK LEFT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}\ufe0f",
-    "\N{BLACK RIGHT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}\ufe0f",
-    "\N{BLACK SQUARE FOR STOP}\ufe0f",
-]
+PAGINATOR_PREVIOUS_EMOJI = "\N{BLACK LEFT-POINTING TRIANGLE}\ufe0f"
+PAGINATOR_NEXT_EMOJI = "\N{BLACK RIGHT-POINTING TRIANGLE}\ufe0f"
+PAGINATOR_TIMEOUT = 180
+PAGINATOR_SWEEP_INTERVAL = 30
+
+
+EMOJI_SIZE = 128
+EMOJI_MIN_SIZE = 32
+EMOJI_SIZE_STEP = 0.75
+EMOJI_MAX_BYTES = 256 * 1024
+EMOJI_MAX_PIXELS = 4096 * 4096
+EMOJI_MAX_FRAMES = 500
+EMOJI_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+EMOJI_ARCHIVE_MAX_MEMBERS = 250
+EMOJI_CACHE_SIZE = 128
+EMOJI_CACHE_TTL = 3600
+IMAGE_WORKERS = 2
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+IMAGE_EXTENSIONS = {".gif": "gif", ".jpeg": "jpeg", ".jpg": "jpeg", ".png": "png"}
+
+EMBED_DESCRIPTION_LIMIT = 4096
+
+RENDERED_PAGE_CACHE_SIZE = 16
+RENDERED_PAGE_CACHE_TTL = 600
+
+CURSOR_PAGE_WINDOW = 2
+CURSOR_COUNT_CACHE_SIZE = 256
+CURSOR_COUNT_CACHE_TTL = 60
+
+
+AUDIT_LOG_FETCH_LIMIT = 5
+AUDIT_LOG_MAX_AGE = 10
+AUDIT_LOG_BUFFER_SIZE = 50
+AUDIT_LOG_WAIT_TIMEOUT = 5
+
+
+CLUSTER_START_DELAY = 5
+CLUSTER_RESTART_DELAY = 5
+
+IPC_CHANNEL = "cluster:ipc"
+IPC_TIMEOUT = 5
+
+
+GUILD_CACHE_POLL_INTERVAL = 30
+
+MEMBER_LEVEL_CACHE_SIZE = 10000
+MEMBER_LEVEL_CACHE_TTL = 300
+
+MIGRATION_BATCH_SIZE = 500
+
+LEADERBOARD_BATCH_SIZE = 1000
+MEMBER_QUERY_BATCH_SIZE = 100
+
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_REPORT_INTERVAL = 60
+
+TIMER_WINDOW = 60
+TIMER_WINDOW_SIZE = 1000
+TIMER_CLAIM_LEASE = 30
+
+COOLDOWN_LEASE_FRACTION = 0.25
+COOLDOWN_LEASE_MAX_ENTRIES = 10000
+
+HELP_CHECK_CONCURRENCY = 16
+HELP_FILTER_CACHE_SIZE = 1024
+HELP_FILTER_CACHE_TTL = 30
+HELP_EMBED_CACHE_SIZE = 512
+HELP_EMBED_CACHE_TTL = 3600
 
+COMMAND_SYNC_KEY = "command_sync"
 
-AUDIT_LOG_RETRY_DELAY = 2.5
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
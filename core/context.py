@@ -1,3 +1,5 @@
+import time
+
 import discord
 from discord.ext import commands
 
@@ -50,6 +52,7 @@ class ConfirmationView(discord.ui.View):
 class CustomContext(commands.Context):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.started_at = time.perf_counter()
 
     def response_embed(self, message, *, style=EmbedStyle.SUCCESS):
         if style not in EmbedStyle:
@@ -62,7 +65,7 @@ class CustomContext(commands.Context):
         return embed
 
     async def reply(self, content=None, *, mention_author=False, **kwargs):
-        await super().reply(content, mention_author=mention_author, **kwargs)
+        return await super().reply(content, mention_author=mention_author, **kwargs)
 
     async def confirm(
         self,
@@ -8,19 +8,45 @@ from .constants import TIME_REGEX
 
 class BanConverter(commands.Converter):
     async def convert(self, ctx, argument):
+        bans = ctx.bot.bans.get(ctx.guild)
+
         try:
-            return await ctx.guild.fetch_ban(discord.Object(int(argument)))
-        except discord.NotFound:
-            raise commands.BadArgument("This member is not banned.")
+            user_id = int(argument)
         except ValueError:
             pass
-
-        bans = await ctx.guild.bans()
-        user = discord.utils.find(lambda u: str(u.user) == argument, bans)
-        if user is None:
+        else:
+            if bans is not None:
+                entry = bans.get(user_id)
+            else:
+                try:
+                    entry = await ctx.guild.fetch_ban(discord.Object(user_id))
+                except discord.NotFound:
+                    entry = None
+
+            if entry is None:
+                raise commands.BadArgument("This member is not banned.")
+            return entry
+
+        if bans is None:
+            bans = await ctx.bot.bans.fetch(ctx.guild)
+
+        matches = bans.find(argument)
+        if len(matches) == 1:
+            return matches[0]
+
+        # Never guess who to unban from a partial or ambiguous name.
+        candidates = matches or bans.search(argument, limit=5)
+        if not candidates:
             raise commands.BadArgument("This member is not banned.")
 
-        return user
+        listed = ", ".join(
+            f"`{entry.user}` ({entry.user.id})" for entry in candidates[:5]
+        )
+        if matches:
+            message = f"Multiple banned users are named `{argument}`: {listed}"
+        else:
+            message = f"No banned user is named `{argument}`. Did you mean: {listed}"
+        raise commands.BadArgument(f"{message}. Use their ID or exact tag instead.")
 
 
 class TimeConverter(commands.Converter):
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import time
+
+from discord.ext import commands
+
+from .constants import COOLDOWN_LEASE_FRACTION, COOLDOWN_LEASE_MAX_ENTRIES
+from .enums import CooldownAlgorithm
+
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local per = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or rate
+local updated = tonumber(state[2]) or now
+tokens = math.min(rate, tokens + (now - updated) * rate / per)
+
+if tokens < 1 then
+    return {0, tostring((1 - tokens) * per / rate)}
+end
+
+-- Only lease extra tokens to the caller while the bucket is mostly full.
+if tokens < rate / 2 then
+    requested = 1
+end
+
+local granted = math.min(requested, math.floor(tokens))
+redis.call(
+    "HSET", KEYS[1], "tokens", tostring(tokens - granted), "updated", tostring(now)
+)
+redis.call("PEXPIRE", KEYS[1], math.ceil(per * 1000))
+return {granted, "0"}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local per = tonumber(ARGV[2])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - per)
+
+if redis.call("ZCARD", KEYS[1]) >= rate then
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    return {0, tostring(tonumber(oldest[2]) + per - now)}
+end
+
+redis.call("ZADD", KEYS[1], now, ARGV[3])
+redis.call("PEXPIRE", KEYS[1], math.ceil(per * 1000))
+return {1, "0"}
+"""
+
+
+TOKEN_BUCKET_PEEK_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local per = tonumber(ARGV[2])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or rate
+local updated = tonumber(state[2]) or now
+tokens = math.min(rate, tokens + (now - updated) * rate / per)
+
+if tokens < 1 then
+    return tostring((1 - tokens) * per / rate)
+end
+return "0"
+"""
+
+SLIDING_WINDOW_PEEK_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local per = tonumber(ARGV[2])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local recent = redis.call(
+    "ZRANGEBYSCORE", KEYS[1], "(" .. tostring(now - per), "+inf", "WITHSCORES"
+)
+if #recent / 2 < rate then
+    return "0"
+end
+return tostring(tonumber(recent[(#recent / 2 - rate) * 2 + 2]) + per - now)
+"""
+
+
+class DistributedCooldown:
+    # Command.is_on_cooldown, reset_cooldown and get_cooldown_retry_after are
+    # synchronous, so they are answered from what this process last saw in
+    # Redis. DistributedCooldownMapping.retry_after and reset are exact.
+
+    def __init__(self, mapping, ctx):
+        self.mapping = mapping
+        self.ctx = ctx
+        self.rate = mapping._cooldown.rate
+        self.per = mapping._cooldown.per
+
+    def update_rate_limit(self, current=None, *, tokens=1):
+        # Consumed asynchronously by acquire_cooldown instead.
+        return None
+
+    def get_retry_after(self, current=None):
+        return self.mapping.last_retry_after(self.ctx)
+
+    def get_tokens(self, current=None):
+        return 0 if self.get_retry_after() else self.rate
+
+    def reset(self):
+        self.mapping.schedule_reset(self.ctx)
+
+
+class DistributedCooldownMapping(commands.CooldownMapping):
+    def __init__(self, rate, per, type, *, algorithm=CooldownAlgorithm.TOKEN_BUCKET):
+        super().__init__(commands.Cooldown(rate, per), type)
+        self.algorithm = algorithm
+        self._leases = {}
+        self._blocked = {}
+        self._tasks = set()
+
+    def copy(self):
+        rate, per = self._cooldown.rate, self._cooldown.per
+        return self.__class__(rate, per, self._type, algorithm=self.algorithm)
+
+    def get_bucket(self, ctx, current=None):
+        return DistributedCooldown(self, ctx)
+
+    def last_retry_after(self, ctx):
+        blocked_until = self._blocked.get(self.redis_key(ctx))
+        if blocked_until is None:
+            return 0.0
+        return max(0.0, blocked_until - time.monotonic())
+
+    async def retry_after(self, ctx):
+        rate, per = self._cooldown.rate, self._cooldown.per
+        source = (
+            TOKEN_BUCKET_PEEK_SCRIPT
+            if self.algorithm is CooldownAlgorithm.TOKEN_BUCKET
+            else SLIDING_WINDOW_PEEK_SCRIPT
+        )
+        script = ctx.bot.get_cog("Redis").script(source)
+        return float(await script(keys=[self.redis_key(ctx)], args=[rate, per]))
+
+    async def reset(self, ctx):
+        key = self.redis_key(ctx)
+        self._leases.pop(key, None)
+        self._blocked.pop(key, None)
+        await ctx.bot.redis.delete(key)
+
+    def schedule_reset(self, ctx):
+        key = self.redis_key(ctx)
+        self._leases.pop(key, None)
+        self._blocked.pop(key, None)
+
+        task = asyncio.create_task(self.reset(ctx))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def redis_key(self, ctx):
+        key = self._bucket_key(ctx.message)
+        if isinstance(key, tuple):
+            key = ":".join(map(str, key))
+        return f"cooldown:{ctx.command.qualified_name}:{key or 'global'}"
+
+    def _take_lease(self, key):
+        lease = self._leases.get(key)
+        if lease is None:
+            return False
+
+        tokens, expires_at = lease
+        if expires_at < time.monotonic():
+            del self._leases[key]
+            return False
+
+        if tokens <= 1:
+            del self._leases[key]
+        else:
+            self._leases[key] = (tokens - 1, expires_at)
+        return True
+
+    def _store_lease(self, key, tokens):
+        if len(self._leases) >= COOLDOWN_LEASE_MAX_ENTRIES:
+            now = time.monotonic()
+            self._leases = {
+                k: lease for k, lease in self._leases.items() if lease[1] >= now
+            }
+
+        rate, per = self._cooldown.rate, self._cooldown.per
+        self._leases[key] = (tokens, time.monotonic() + per / rate)
+
+    async def acquire(self, ctx):
+        key = self.redis_key(ctx)
+        rate, per = self._cooldown.rate, self._cooldown.per
+
+        if self.algorithm is CooldownAlgorithm.TOKEN_BUCKET:
+            if self._take_lease(key):
+                return
+
+            requested = max(1, int(rate * COOLDOWN_LEASE_FRACTION))
+            script = ctx.bot.get_cog("Redis").script(TOKEN_BUCKET_SCRIPT)
+            granted, retry_after = await script(keys=[key], args=[rate, per, requested])
+        else:
+            member = f"{time.time_ns()}:{os.urandom(4).hex()}"
+            script = ctx.bot.get_cog("Redis").script(SLIDING_WINDOW_SCRIPT)
+            granted, retry_after = await script(keys=[key], args=[rate, per, member])
+
+        granted = int(granted)
+        if granted == 0:
+            now = time.monotonic()
+            if len(self._blocked) >= COOLDOWN_LEASE_MAX_ENTRIES:
+                self._blocked = {k: v for k, v in self._blocked.items() if v >= now}
+            self._blocked[key] = now + float(retry_after)
+            raise commands.CommandOnCooldown(
+                self._cooldown, float(retry_after), self._type
+            )
+
+        self._blocked.pop(key, None)
+
+        if granted > 1:
+            self._store_lease(key, granted - 1)
+
+
+def distributed_cooldown(
+    rate,
+    per,
+    type=commands.BucketType.default,
+    *,
+    algorithm=CooldownAlgorithm.TOKEN_BUCKET,
+):
+    def decorator(func):
+        mapping = DistributedCooldownMapping(rate, per, type, algorithm=algorithm)
+        if isinstance(func, commands.Command):
+            func._buckets = mapping
+        else:
+            func.__commands_cooldown__ = mapping
+        return func
+
+    return decorator
+
+
+async def acquire_cooldown(ctx):
+    buckets = ctx.command._buckets
+    if isinstance(buckets, DistributedCooldownMapping):
+        await buckets.acquire(ctx)
@@ -1,6 +1,21 @@
-from enum import Enum
+from enum import Enum, Flag, auto
 
 
 class EmbedStyle(Enum):
     SUCCESS = {"color": 0x2ECC71, "emoji": "<:_:1230098071291953175>"}
     FAILURE = {"color": 0xE74C3C, "emoji": "<:_:1230095980506906694>"}
+
+
+class PermissionTier(Flag):
+    NONE = 0
+    OWNER = auto()
+    ADMIN = auto()
+    MANAGER = auto()
+    MODERATOR = auto()
+    TRIAL_MODERATOR = auto()
+    BOOSTER = auto()
+
+
+class CooldownAlgorithm(Enum):
+    TOKEN_BUCKET = "token_bucket"
+    SLIDING_WINDOW = "sliding_window"
@@ -0,0 +1,99 @@
+import zipfile
+from io import BytesIO
+
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+from .constants import (
+    EMOJI_MAX_BYTES,
+    EMOJI_MAX_FRAMES,
+    EMOJI_MAX_PIXELS,
+    EMOJI_MIN_SIZE,
+    EMOJI_SIZE,
+    EMOJI_SIZE_STEP,
+)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def _save_static(image, size, format):
+    with BytesIO() as buffer:
+        image.resize((size, size)).save(buffer, format, optimize=True)
+        return buffer.getvalue()
+
+
+def _save_animated(frames, size, durations, loop):
+    resized = [frame.resize((size, size)) for frame in frames]
+
+    with BytesIO() as buffer:
+        resized[0].save(
+            buffer,
+            "gif",
+            save_all=True,
+            append_images=resized[1:],
+            duration=durations,
+            loop=loop,
+            disposal=2,
+            optimize=True,
+        )
+        return buffer.getvalue()
+
+
+def _fit(encode):
+    size = EMOJI_SIZE
+    while size >= EMOJI_MIN_SIZE:
+        data = encode(size)
+        if len(data) <= EMOJI_MAX_BYTES:
+            return data
+        size = int(size * EMOJI_SIZE_STEP)
+
+    raise ImageTooLarge("This image is too large to fit Discord's emoji size limit.")
+
+
+def _open(data):
+    try:
+        return Image.open(BytesIO(data))
+    except UnidentifiedImageError:
+        raise InvalidImage("This file is not a valid image.")
+    except Image.DecompressionBombError:
+        raise ImageTooLarge("This image's dimensions are too large.")
+
+
+def process_emoji(data, format):
+    with _open(data) as image:
+        if image.width * image.height > EMOJI_MAX_PIXELS:
+            raise ImageTooLarge("This image's dimensions are too large.")
+
+        if getattr(image, "is_animated", False):
+            # Frames are scaled down as they are decoded so that memory stays
+            # bounded by the frame cap rather than the source dimensions.
+            frames, durations = [], []
+            for frame in ImageSequence.Iterator(image):
+                if len(frames) >= EMOJI_MAX_FRAMES:
+                    raise ImageTooLarge("This image has too many frames.")
+                frames.append(frame.convert("RGBA").resize((EMOJI_SIZE, EMOJI_SIZE)))
+                durations.append(frame.info.get("duration", 100))
+
+            loop = image.info.get("loop", 0)
+            return "gif", _fit(
+                lambda size: _save_animated(frames, size, durations, loop)
+            )
+
+        if format == "jpeg":
+            image.draft("RGB", (EMOJI_SIZE, EMOJI_SIZE))
+        else:
+            format = "png"
+
+        image.load()
+        return format, _fit(lambda size: _save_static(image, size, format))
+
+
+def process_archive_member(path, member, format):
+    with zipfile.ZipFile(path) as archive:
+        data = archive.read(member)
+    return process_emoji(data, format)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import sys
+import traceback
+
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+from .constants import IPC_CHANNEL, IPC_TIMEOUT
+
+
+class ClusterIPC:
+    def __init__(self, bot):
+        self.bot = bot
+        self._handlers = {}
+        self._pending = {}
+        self._client = None
+        self._pubsub = None
+        self._task = None
+        self._tasks = set()
+
+    def add_handler(self, op, func):
+        self._handlers[op] = func
+
+    async def start(self, client):
+        self._client = client
+        await self._subscribe()
+        self._task = asyncio.create_task(self._listen())
+
+    async def _subscribe(self):
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(IPC_CHANNEL)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+
+    async def _publish(self, payload):
+        await self._client.publish(IPC_CHANNEL, json.dumps(payload))
+
+    async def _listen(self):
+        backoff = ExponentialBackoff()
+        failures = 0
+
+        while True:
+            try:
+                if failures:
+                    await self._subscribe()
+
+                async for message in self._pubsub.listen():
+                    failures = 0
+                    if message["type"] == "message":
+                        self._dispatch(message["data"])
+            except (ConnectionError, TimeoutError) as e:
+                print(f"Lost IPC connection, reconnecting: {e}")
+                await asyncio.sleep(backoff.compute(failures))
+                failures += 1
+
+    def _dispatch(self, data):
+        try:
+            payload = json.loads(data)
+            kind = payload["kind"]
+            if kind in ("request", "notify"):
+                func = self._handlers.get(payload["op"])
+                if func is None or (kind == "request" and "nonce" not in payload):
+                    return
+                task = asyncio.create_task(self._handle(func, payload))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            elif kind == "response":
+                self._resolve(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring malformed IPC message: {e!r}")
+
+    async def _handle(self, func, payload):
+        result = error = None
+        try:
+            result = await func(**payload["data"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+
+        # Notifications are fire-and-forget, so nobody waits for a response.
+        if payload["kind"] == "notify":
+            return
+
+        try:
+            await self._publish(
+                {
+                    "kind": "response",
+                    "nonce": payload["nonce"],
+                    "cluster_id": self.bot.cluster_id,
+                    "result": result,
+                    "error": error,
+                }
+            )
+        except (ConnectionError, TimeoutError) as e:
+            print(f"Failed to send IPC response: {e}")
+
+    def _resolve(self, payload):
+        pending = self._pending.get(payload["nonce"])
+        if pending is None:
+            return
+
+        responses, future, expected = pending
+        responses[payload["cluster_id"]] = payload
+        if len(responses) >= expected and not future.done():
+            future.set_result(None)
+
+    async def notify(self, op, **data):
+        if self._client is None:
+            return
+
+        await self._publish({"kind": "notify", "op": op, "data": data})
+
+    async def broadcast(self, op, *, timeout=IPC_TIMEOUT, **data):
+        nonce = os.urandom(8).hex()
+        responses = {}
+        future = self.bot.loop.create_future()
+        self._pending[nonce] = (responses, future, self.bot.cluster_count)
+
+        try:
+            await self._publish(
+                {"kind": "request", "nonce": nonce, "op": op, "data": data}
+            )
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            del self._pending[nonce]
+
+        return dict(sorted(responses.items()))
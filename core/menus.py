@@ -1,86 +1,184 @@
 import abc
+import asyncio
+import itertools
+import math
+import time
 
 import discord
-from discord.ext import menus
+from discord.ext import menus, tasks
+
+from .cache import TTLCache
+from .constants import (
+    CURSOR_COUNT_CACHE_SIZE,
+    CURSOR_COUNT_CACHE_TTL,
+    CURSOR_PAGE_WINDOW,
+    EMBED_DESCRIPTION_LIMIT,
+    PAGINATOR_NEXT_EMOJI,
+    PAGINATOR_PREVIOUS_EMOJI,
+    PAGINATOR_SWEEP_INTERVAL,
+    PAGINATOR_TIMEOUT,
+    RENDERED_PAGE_CACHE_SIZE,
+    RENDERED_PAGE_CACHE_TTL,
+)
+
+
+class Paginator:
+    __slots__ = ("id", "source", "timeout", "author_id", "current_page", "message")
+
+    def __init__(self, source, *, timeout=PAGINATOR_TIMEOUT):
+        self.id = None
+        self.source = source
+        self.timeout = timeout
+        self.author_id = None
+        self.current_page = 0
+        self.message = None
+
+    async def _get_kwargs_from_page(self, page):
+        value = await discord.utils.maybe_coroutine(self.source.format_page, self, page)
+        if isinstance(value, dict):
+            return value
+        elif isinstance(value, str):
+            return {"content": value, "embed": None}
+        elif isinstance(value, discord.Embed):
+            return {"embed": value, "content": None}
 
-from .constants import EXCLUDED_PAGINATOR_BUTTONS
+    def _prepare_view(self):
+        if not self.source.is_paginating():
+            return None
+
+        max_pages = self.source.get_max_pages()
+        previous_page, next_page = self.current_page - 1, self.current_page + 1
+
+        view = discord.ui.View(timeout=None)
+        view.add_item(
+            PaginatorButton(
+                self.id,
+                "prev",
+                previous_page,
+                emoji=PAGINATOR_PREVIOUS_EMOJI,
+                disabled=previous_page < 0,
+            )
+        )
+        view.add_item(
+            PaginatorButton(
+                self.id,
+                "next",
+                next_page,
+                emoji=PAGINATOR_NEXT_EMOJI,
+                disabled=max_pages is not None and next_page >= max_pages,
+            )
+        )
 
+        # A stopped view is never stored per message; clicks are routed to
+        # PaginatorButton, which is registered once as a dynamic item.
+        view.stop()
+        return view
 
-class Paginator(menus.MenuPages, menus.Menu):
-    def __init__(self, source, auto_defer=True, **kwargs):
-        super().__init__(source, **kwargs)
-        self.auto_defer = auto_defer
-        self.clear_reactions_after = True
+    async def start(self, ctx):
+        await self.source._prepare_once()
+        page = await self.source.get_page(0)
+        kwargs = await self._get_kwargs_from_page(page)
 
-    def _prepare_view(self):
-        if not self.should_add_reactions():
+        self.author_id = ctx.author.id
+        ctx.bot.menus.add(self)
+        self.message = await ctx.reply(**kwargs, view=self._prepare_view())
+
+    async def show_page(self, interaction, page_number):
+        # Pages may come from the database, so acknowledge the click before
+        # fetching to stay within the interaction response deadline.
+        await interaction.response.defer()
+
+        max_pages = self.source.get_max_pages()
+        if page_number < 0 or (max_pages is not None and page_number >= max_pages):
+            return
+
+        page = await self.source.get_page(page_number)
+        if not page and page_number > 0:
+            return
+
+        self.current_page = page_number
+        kwargs = await self._get_kwargs_from_page(page)
+        interaction.client.menus.touch(self)
+        await interaction.edit_original_response(**kwargs, view=self._prepare_view())
+
+
+class PaginatorButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"menu:(?P<menu_id>[0-9]+):(?P<action>prev|next):(?P<page>-?[0-9]+)",
+):
+    def __init__(self, menu_id, action, page, *, emoji=None, disabled=False):
+        super().__init__(
+            discord.ui.Button(
+                emoji=emoji,
+                disabled=disabled,
+                custom_id=f"menu:{menu_id}:{action}:{page}",
+            )
+        )
+        self.menu_id = menu_id
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["menu_id"]), match["action"], int(match["page"]))
+
+    async def callback(self, interaction):
+        menu = interaction.client.menus.get(self.menu_id)
+        if menu is None:
+            return await interaction.response.edit_message(view=None)
+
+        if interaction.user.id != menu.author_id:
+            return await interaction.response.defer()
+
+        await menu.show_page(interaction, self.page)
+
+
+class MenuStore:
+    def __init__(self, bot):
+        self.bot = bot
+        self._menus = {}
+        self._ids = itertools.count()
+
+    def __len__(self):
+        return len(self._menus)
+
+    def add(self, menu):
+        # IDs are snowflake-like so they stay unique across restarts and
+        # buttons on menus from a previous run are recognised as expired.
+        snowflake = discord.utils.time_snowflake(discord.utils.utcnow())
+        menu.id = snowflake + next(self._ids) % 4096
+        self._menus[menu.id] = (menu, time.monotonic() + menu.timeout)
+
+        if not self.sweep.is_running():
+            self.sweep.start()
+
+    def get(self, menu_id):
+        entry = self._menus.get(menu_id)
+        if entry is None or entry[1] < time.monotonic():
             return None
+        return entry[0]
 
-        def callback(button):
-            async def button_callback(interaction):
-                if interaction.user.id != self._author_id:
-                    return
+    def touch(self, menu):
+        if menu.id in self._menus:
+            self._menus[menu.id] = (menu, time.monotonic() + menu.timeout)
+
+    @tasks.loop(seconds=PAGINATOR_SWEEP_INTERVAL)
+    async def sweep(self):
+        now = time.monotonic()
+        expired = [
+            menu for menu, expires_at in self._menus.values() if expires_at < now
+        ]
 
-                if self.auto_defer:
-                    await interaction.response.defer()
+        for menu in expired:
+            del self._menus[menu.id]
 
+            if menu.message is not None and not self.bot.is_closed():
                 try:
-                    if button.lock:
-                        async with self._lock:
-                            if self._running:
-                                await button(self, interaction)
-                    else:
-                        await button(self, interaction)
-                except Exception as exc:
-                    await self.on_menu_button_error(exc)
-
-            return button_callback
-
-        view = discord.ui.View(timeout=self.timeout)
-        for i, (emoji, button) in enumerate(self.buttons.items()):
-            if emoji in EXCLUDED_PAGINATOR_BUTTONS:
-                continue
-
-            item = discord.ui.Button(emoji=emoji, row=i // 5)
-            item.callback = callback(button)
-            view.add_item(item)
-
-        self.view = view
-        return view
+                    await menu.message.edit(view=None)
+                except discord.HTTPException:
+                    pass
 
-    async def _internal_loop(self):
-        self.__timed_out = False
-
-        try:
-            self.__timed_out = await self.view.wait()
-        except Exception:
-            pass
-        finally:
-            self._event.set()
-
-            try:
-                await self.finalize(self.__timed_out)
-            except Exception:
-                pass
-            finally:
-                self.__timed_out = False
-
-            if self.bot.is_closed():
-                return
-
-            try:
-                if self.delete_message_after:
-                    return await self.message.delete()
-
-                if self.clear_reactions_after:
-                    return await self.message.edit(view=None)
-            except Exception:
-                pass
-
-    async def send_initial_message(self, ctx, channel):
-        page = await self._source.get_page(0)
-        kwargs = await self._get_kwargs_from_page(page)
-        return await ctx.reply(**kwargs, view=self._prepare_view())
+        if not self._menus:
+            self.sweep.stop()
 
 
 class EmbedPageSource(menus.AsyncIteratorPageSource, abc.ABC):
@@ -111,17 +209,28 @@ class EmbedPageSource(menus.AsyncIteratorPageSource, abc.ABC):
 
         if self.show_index:
             embed.set_footer(
-                text=f"Showing entries {start + 1}–{start + len(page)} out of {len(self._cache)}"
+                text=f"Showing entries {start + 1}–{start + len(page)} out of {self.total_entries}"
             )
 
         return embed
 
+    @property
+    def total_entries(self):
+        return len(self._cache)
+
     @abc.abstractmethod
     async def format_page(self, menu, page):
         raise NotImplementedError
 
 
 class CodeBlockTablePageSource(EmbedPageSource):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._widths = []
+        self._rendered = TTLCache(
+            maxsize=RENDERED_PAGE_CACHE_SIZE, ttl=RENDERED_PAGE_CACHE_TTL
+        )
+
     def justify(self, string, width):
         return string.rjust(width) if string.isdigit() else string.ljust(width)
 
@@ -139,20 +248,59 @@ class CodeBlockTablePageSource(EmbedPageSource):
 
         return table
 
+    def _update_widths(self, table):
+        widths = self._widths
+        changed = False
+
+        if self.show_index and not widths:
+            widths.append(len(f"{self.total_entries}."))
+
+        for line in table:
+            if len(line) > len(widths):
+                widths.extend([0] * (len(line) - len(widths)))
+
+            for i, x in enumerate(line):
+                if len(x) > widths[i]:
+                    widths[i] = len(x)
+                    changed = True
+
+        return changed
+
+    def _render_table(self, table):
+        limit = EMBED_DESCRIPTION_LIMIT - len("``````")
+        lines = []
+        length = 0
+
+        for line in table:
+            line = "  ".join(
+                self.justify(x, self._widths[i]) for i, x in enumerate(line)
+            ).rstrip()
+
+            length += len(line) + 1
+            if length > limit:
+                break
+            lines.append(line)
+
+        return "```" + "\n".join(lines) + "```"
+
     async def format_page(self, menu, page):
-        embed = self._prepare_embed(menu, page)
+        key = (menu.current_page, self.total_entries)
+        if (embed := self._rendered.get(key)) is not None:
+            return embed.copy()
+
         table = self._prepare_table(menu, page)
 
-        width = [max(len(x) for x in column) for column in zip(*table)]
-        lines = [
-            "  ".join(self.justify(x, width[i]) for i, x in enumerate(line)).rstrip()
-            for line in table
-        ]
+        # Widths only ever grow, so pages rendered with narrower columns
+        # are dropped to keep every page aligned the same way.
+        if self._update_widths(table):
+            self._rendered.clear()
 
-        embed.description = "```" + "\n".join(lines) + "```"
+        embed = self._prepare_embed(menu, page)
+        embed.description = self._render_table(table)
         self.format_embed(embed)
 
-        return embed
+        self._rendered.set(key, embed)
+        return embed.copy()
 
 
 class FieldsPageSource(EmbedPageSource):
@@ -166,6 +314,146 @@ class FieldsPageSource(EmbedPageSource):
         return embed
 
 
+def get_path(entry, path):
+    for key in path.split("."):
+        if not isinstance(entry, dict):
+            return None
+        entry = entry.get(key)
+    return entry
+
+
+def project_sort_fields(projection, sort):
+    # Page anchors are read from the sort fields, so they can't be projected
+    # out; include them in an inclusion projection and drop them from an
+    # exclusion one.
+    if projection is None:
+        return None
+
+    fields = [name for name, _ in sort]
+    if not isinstance(projection, dict):
+        return [*projection, *(x for x in fields if x not in projection)]
+
+    if any(v for k, v in projection.items() if k != "_id"):
+        return {**projection, **dict.fromkeys(fields, 1)}
+    return {k: v for k, v in projection.items() if k not in fields}
+
+
+class CursorPageSource:
+    _counts = TTLCache(
+        maxsize=CURSOR_COUNT_CACHE_SIZE,
+        ttl=CURSOR_COUNT_CACHE_TTL,
+        name="cursor_counts",
+    )
+
+    def __init__(
+        self,
+        collection,
+        *,
+        filter=None,
+        sort=(("_id", 1),),
+        projection=None,
+        window=CURSOR_PAGE_WINDOW,
+        **kwargs,
+    ):
+        super().__init__(None, **kwargs)
+        self.collection = collection
+        self.filter = filter or {}
+        self.sort = list(sort)
+        # Keyset pagination needs a total order, otherwise rows that tie on
+        # the sort keys at a page boundary are skipped.
+        if all(name != "_id" for name, _ in self.sort):
+            self.sort.append(("_id", 1))
+        self.projection = project_sort_fields(projection, self.sort)
+        self.window = window
+        self._total = 0
+        self._pages = {}
+        self._anchors = {0: None}
+
+    async def _count(self):
+        if not self.filter:
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents(self.filter)
+
+    async def prepare(self):
+        key = (self.collection.full_name, repr(self.filter))
+        self._total = await self._counts.get_or_fetch(key, self._count)
+
+    def is_paginating(self):
+        return self._total > self.per_page
+
+    def get_max_pages(self):
+        return max(1, math.ceil(self._total / self.per_page))
+
+    @property
+    def total_entries(self):
+        return self._total
+
+    def _keyset_filter(self, anchor):
+        if anchor is None:
+            return self.filter
+
+        clauses = []
+        for i, (name, direction) in enumerate(self.sort):
+            clause = {field: anchor[field] for field, _ in self.sort[:i]}
+            clause[name] = {"$gt" if direction > 0 else "$lt": anchor[name]}
+            clauses.append(clause)
+
+        return {"$and": [self.filter, {"$or": clauses}]}
+
+    async def _fetch_page(self, page_number):
+        if page_number not in self._anchors:
+            await self._page_task(page_number - 1)
+
+        cursor = (
+            self.collection.find(
+                self._keyset_filter(self._anchors[page_number]), self.projection
+            )
+            .sort(self.sort)
+            .limit(self.per_page)
+        )
+        entries = await cursor.to_list(length=self.per_page)
+
+        if entries:
+            anchor = {field: get_path(entries[-1], field) for field, _ in self.sort}
+            self._anchors[page_number + 1] = anchor
+
+        return entries
+
+    def _page_task(self, page_number):
+        task = self._pages.get(page_number)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_page(page_number))
+            task.add_done_callback(lambda t: self._page_done(page_number, t))
+            self._pages[page_number] = task
+        return task
+
+    def _page_done(self, page_number, task):
+        # Prefetches are never awaited if the page isn't viewed, so failures
+        # are retrieved here and the page is fetched again when it is.
+        if not task.cancelled() and task.exception() is not None:
+            if self._pages.get(page_number) is task:
+                del self._pages[page_number]
+
+    async def get_page(self, page_number):
+        entries = await self._page_task(page_number)
+
+        for n in [n for n in self._pages if abs(n - page_number) > self.window]:
+            self._pages.pop(n).cancel()
+
+        if page_number + 1 < self.get_max_pages():
+            self._page_task(page_number + 1)
+
+        return entries
+
+
+class CursorTablePageSource(CursorPageSource, CodeBlockTablePageSource):
+    pass
+
+
+class CursorFieldsPageSource(CursorPageSource, FieldsPageSource):
+    pass
+
+
 class HelpPageSource(menus.ListPageSource):
     def __init__(self, ctx, entries, *, color, per_page=6):
         super().__init__(entries, per_page=per_page)
@@ -0,0 +1,218 @@
+import bisect
+import math
+import time
+
+from .cache import caches
+from .constants import METRICS_LATENCY_BUCKETS
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def get(self, *labels):
+        return self._values.get(labels, 0)
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+    def items(self):
+        return self._values.items()
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name + _format_labels(self.labels, labels), value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        for name, value in self.samples():
+            yield f"{name} {_format_value(value)}"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        # Commands run on a single event loop, so a plain read-modify-write
+        # is never interleaved and needs no lock.
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return 0 if entry is None else sum(entry[0])
+
+    def quantile(self, q, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            return None
+
+        target = q * sum(entry[0])
+        total = 0
+        for bound, count in zip((*self.buckets, math.inf), entry[0]):
+            total += count
+            if total >= target:
+                return bound
+
+    def samples(self):
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labels, labels, le)}",
+                    cumulative,
+                )
+            suffix = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{suffix}", total
+            yield f"{self.name}_count{suffix}", cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), **kwargs):
+        return self.register(Histogram(name, documentation, labels, **kwargs))
+
+    def add_collector(self, func):
+        self._collectors.append(func)
+
+    def collect(self):
+        for func in self._collectors:
+            func()
+
+    def render(self):
+        self.collect()
+        lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+class BotMetrics:
+    def __init__(self, bot):
+        self.bot = bot
+        self.registry = registry = MetricsRegistry()
+
+        self.commands = registry.counter(
+            "bot_commands_total",
+            "Commands that finished running, by outcome.",
+            ("command", "status"),
+        )
+        self.command_duration = registry.histogram(
+            "bot_command_duration_seconds",
+            "Time from receiving a command to it finishing.",
+            ("command",),
+        )
+        self.command_prepare = registry.histogram(
+            "bot_command_prepare_seconds",
+            "Time spent on checks and argument conversion.",
+            ("command",),
+        )
+        self.command_errors = registry.counter(
+            "bot_command_errors_total",
+            "Command errors, by error type.",
+            ("command", "error"),
+        )
+        self.gateway_latency = registry.gauge(
+            "bot_gateway_latency_seconds",
+            "Heartbeat latency of each shard.",
+            ("shard",),
+        )
+        self.message_filter = registry.counter(
+            "bot_message_filter_total",
+            "Messages passed to or dropped by the command pre-filter.",
+            ("result",),
+        )
+        self.cache_requests = registry.counter(
+            "bot_cache_requests_total",
+            "Cache lookups, by cache and result.",
+            ("cache", "result"),
+        )
+        self.cache_entries = registry.gauge(
+            "bot_cache_entries",
+            "Entries currently held by each cache.",
+            ("cache",),
+        )
+        registry.add_collector(self.collect)
+
+    def collect(self):
+        for shard_id, latency in self.bot.latencies:
+            if math.isfinite(latency):
+                self.gateway_latency.set(str(shard_id), value=latency)
+
+        for result, count in self.bot.message_filter_stats.items():
+            self.message_filter.set(result, value=count)
+
+        for name, cache in caches.items():
+            self.cache_requests.set(name, "hit", value=cache.hits)
+            self.cache_requests.set(name, "miss", value=cache.misses)
+            self.cache_entries.set(name, value=len(cache))
+
+    def command_prepared(self, ctx):
+        self.command_prepare.observe(
+            time.perf_counter() - ctx.started_at, ctx.command.qualified_name
+        )
+
+    def command_finished(self, ctx):
+        name = ctx.command.qualified_name
+        status = "failed" if ctx.command_failed else "completed"
+        self.commands.inc(name, status)
+        self.command_duration.observe(time.perf_counter() - ctx.started_at, name)
+
+    def command_errored(self, ctx, error):
+        error = getattr(error, "original", error)
+        name = ctx.command.qualified_name if ctx.command else None
+        self.command_errors.inc(name or "", type(error).__name__)
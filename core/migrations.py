@@ -0,0 +1,38 @@
+from pymongo import DeleteOne, UpdateOne
+
+from .constants import MIGRATION_BATCH_SIZE
+
+
+def legacy_member_id(guild_id, user_id):
+    return {"id": user_id, "guild_id": guild_id}
+
+
+async def migrate_member_ids(db, *, query=None, batch_size=MIGRATION_BATCH_SIZE):
+    migrated = 0
+    requests = []
+
+    async def flush():
+        nonlocal migrated, requests
+        if requests:
+            await db.member.bulk_write(requests, ordered=True)
+            migrated += len(requests) // 2
+            requests = []
+
+    # Documents keyed by {"id": ..., "guild_id": ...} are rewritten to carry
+    # top-level guild_id/user_id fields, which the member indexes cover.
+    cursor = db.member.find(
+        {"_id.guild_id": {"$exists": True}, **(query or {})}, batch_size=batch_size
+    )
+    async for entry in cursor:
+        key = entry.pop("_id")
+        query = {"guild_id": key["guild_id"], "user_id": key["id"]}
+        requests.append(
+            UpdateOne(query, {"$setOnInsert": {**entry, **query}}, upsert=True)
+        )
+        requests.append(DeleteOne({"_id": key}))
+
+        if len(requests) >= batch_size * 2:
+            await flush()
+
+    await flush()
+    return migrated
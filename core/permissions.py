@@ -0,0 +1,107 @@
+from . import constants
+from .cache import caches
+from .enums import PermissionTier
+
+
+MANAGER_ROLES = frozenset(constants.MANAGER_ROLES)
+MODERATOR_ROLES = frozenset(constants.MODERATOR_ROLES)
+TRIAL_MODERATOR_ROLES = frozenset(constants.TRIAL_MODERATOR_ROLES)
+
+ADMIN_TIERS = (
+    PermissionTier.ADMIN
+    | PermissionTier.MANAGER
+    | PermissionTier.MODERATOR
+    | PermissionTier.TRIAL_MODERATOR
+    | PermissionTier.BOOSTER
+)
+
+
+def compute_tier(member, *, is_owner=False):
+    tier = PermissionTier.NONE
+
+    if is_owner:
+        tier |= PermissionTier.OWNER | ADMIN_TIERS
+    elif member.id == member.guild.owner_id or member.guild_permissions.administrator:
+        tier |= ADMIN_TIERS
+
+    role_ids = {role.id for role in member.roles}
+    if not role_ids.isdisjoint(MANAGER_ROLES):
+        tier |= PermissionTier.MANAGER
+    if not role_ids.isdisjoint(MODERATOR_ROLES):
+        tier |= PermissionTier.MODERATOR
+    if not role_ids.isdisjoint(TRIAL_MODERATOR_ROLES):
+        tier |= PermissionTier.TRIAL_MODERATOR
+
+    if member.premium_since is not None:
+        tier |= PermissionTier.BOOSTER
+
+    return tier
+
+
+class PermissionResolver:
+    def __init__(self, bot):
+        self.bot = bot
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        caches["permissions"] = self
+
+    def __len__(self):
+        return sum(map(len, self._cache.values()))
+
+    async def resolve(self, member):
+        guild_cache = self._cache.setdefault(member.guild.id, {})
+
+        # Members that aren't cached never fire on_member_update, so entries
+        # are keyed on the fields compute_tier reads from the member itself.
+        # The member passed in always comes from the latest gateway payload.
+        role_ids = tuple(role.id for role in member.roles)
+        key = (role_ids, member.premium_since, member.guild.owner_id)
+
+        entry = guild_cache.get(member.id)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        tier = compute_tier(member, is_owner=await self.bot.is_owner(member))
+        guild_cache[member.id] = (key, tier)
+        return tier
+
+    def invalidate(self, guild_id, member_id=None):
+        if member_id is None:
+            self._cache.pop(guild_id, None)
+        elif guild_cache := self._cache.get(guild_id):
+            guild_cache.pop(member_id, None)
+
+    def register_listeners(self):
+        for listener in (
+            self.on_member_update,
+            self.on_member_remove,
+            self.on_guild_update,
+            self.on_guild_remove,
+            self.on_guild_role_update,
+            self.on_guild_role_delete,
+        ):
+            self.bot.add_listener(listener)
+
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles or before.premium_since != after.premium_since:
+            self.invalidate(after.guild.id, after.id)
+
+    async def on_member_remove(self, member):
+        self.invalidate(member.guild.id, member.id)
+
+    async def on_guild_update(self, before, after):
+        if before.owner_id != after.owner_id:
+            self.invalidate(after.id)
+
+    async def on_guild_remove(self, guild):
+        self.invalidate(guild.id)
+
+    async def on_guild_role_update(self, before, after):
+        if before.permissions != after.permissions:
+            self.invalidate(after.guild.id)
+
+    async def on_guild_role_delete(self, role):
+        self.invalidate(role.guild.id)
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class NameIndex:
+    def __init__(self, items, *, ngram_size=3):
+        self.ngram_size = ngram_size
+        self._entries = sorted(
+            ((label.casefold(), label, target) for label, target in items),
+            key=lambda entry: entry[0],
+        )
+        self._keys = [key for key, *_ in self._entries]
+        self._ngrams = defaultdict(set)
+
+        for i, key in enumerate(self._keys):
+            for n in range(1, ngram_size + 1):
+                for j in range(len(key) - n + 1):
+                    self._ngrams[key[j : j + n]].add(i)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _prefix_matches(self, query):
+        start = bisect_left(self._keys, query)
+        end = bisect_left(self._keys, query + "\U0010ffff", lo=start)
+        return range(start, end)
+
+    def _substring_matches(self, query):
+        n = self.ngram_size
+        if len(query) <= n:
+            return self._ngrams.get(query, set())
+
+        candidates = None
+        for j in range(0, len(query) - n + 1):
+            matches = self._ngrams.get(query[j : j + n])
+            if not matches:
+                return set()
+            candidates = matches if candidates is None else candidates & matches
+
+        return {i for i in candidates if query in self._keys[i]}
+
+    def search(self, query, *, limit=25, predicate=None):
+        query = query.casefold()
+
+        if query:
+            prefix = self._prefix_matches(query)
+            substring = sorted(
+                self._substring_matches(query).difference(prefix),
+                key=lambda i: (self._keys[i].index(query), len(self._keys[i]), i),
+            )
+            prefix = sorted(prefix, key=lambda i: (len(self._keys[i]), i))
+            ranked = [*prefix, *substring]
+        else:
+            ranked = range(len(self._entries))
+
+        results = []
+        for i in ranked:
+            _, label, target = self._entries[i]
+            if predicate is None or predicate(target):
+                results.append((label, target))
+                if len(results) >= limit:
+                    break
+
+        return results
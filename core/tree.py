@@ -0,0 +1,24 @@
+from discord import app_commands
+from discord.utils import MISSING
+
+
+class CommandTree(app_commands.CommandTree):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.guild_ids = set()
+
+    def add_command(self, command, /, *, guild=MISSING, guilds=MISSING, **kwargs):
+        super().add_command(command, guild=guild, guilds=guilds, **kwargs)
+
+        # Records every guild that has been given guild-only commands, so
+        # syncing knows which scopes exist without reading tree internals.
+        if guild is not MISSING:
+            guilds = [] if guild is None else [guild]
+        if guilds is not MISSING:
+            self.guild_ids.update(guild.id for guild in guilds)
+        else:
+            self.guild_ids.update(getattr(command, "_guild_ids", None) or ())
+
+    def copy_global_to(self, *, guild):
+        super().copy_global_to(guild=guild)
+        self.guild_ids.add(guild.id)
@@ -1,26 +1,27 @@
-import asyncio
 import datetime
 
 from dateutil.relativedelta import relativedelta
 
-from .constants import AUDIT_LOG_RETRY_DELAY, TIME_UNITS
+from .constants import AUDIT_LOG_MAX_AGE, AUDIT_LOG_WAIT_TIMEOUT, TIME_UNITS
 
 
-# fmt: off
+async def fetch_recent_audit_log_entry(
+    bot, guild, *, target=None, action=None, timeout=AUDIT_LOG_WAIT_TIMEOUT
+):
+    # Resolves from the gateway-fed AuditLogCache, falling back to a single
+    # HTTP fetch only if no matching entry arrives within the timeout.
+    return await bot.audit_logs.wait_for(
+        guild, target=target, action=action, timeout=timeout
+    )
 
-async def fetch_recent_audit_log_entry(guild, *, target=None, action=None, retry=0):
-    while retry >= 0:
-        async for entry in guild.audit_logs(limit=1, action=action):
-            delta = datetime.datetime.now(datetime.timezone.utc) - entry.created_at
-            if delta < datetime.timedelta(seconds=10) and (target is None or entry.target == target):
-                return entry
-            
-        await asyncio.sleep(AUDIT_LOG_RETRY_DELAY)
-        retry -= 1
 
-    return None
-
-# fmt: on
+def is_recent_audit_log_entry(entry, *, target=None, action=None):
+    delta = datetime.datetime.now(datetime.timezone.utc) - entry.created_at
+    return (
+        delta < datetime.timedelta(seconds=AUDIT_LOG_MAX_AGE)
+        and (action is None or entry.action == action)
+        and (target is None or getattr(entry.target, "id", None) == target.id)
+    )
 
 
 class Plural:
@@ -47,6 +48,17 @@ def human_join(seq, *, delimiter=", ", final="and"):
     return f"{delimiter.join(map(str, seq[:-1]))} {final} {seq[-1]}"
 
 
+def join_limited(items, separator, *, limit=1024):
+    result = ""
+    for i, item in enumerate(items):
+        more = f"{separator}...and {len(items) - i} more"
+        text = item if not result else separator + item
+        if len(result) + len(text) + len(more) > limit:
+            return result + (more if result else more.lstrip(separator))
+        result += text
+    return result
+
+
 def human_timedelta(end, *, reference=None, accuracy=3, brief=False, suffix=True):
     now = reference or datetime.datetime.now(datetime.timezone.utc)
 
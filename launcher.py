@@ -0,0 +1,78 @@
+import asyncio
+import math
+import multiprocessing
+import time
+
+import aiohttp
+
+import config
+from core.constants import CLUSTER_RESTART_DELAY, CLUSTER_START_DELAY
+
+
+async def fetch_shard_count():
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {config.BOT_TOKEN}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data["shards"]
+
+
+def shard_ranges(shard_count, cluster_count):
+    size = math.ceil(shard_count / cluster_count)
+    return [
+        list(range(start, min(start + size, shard_count)))
+        for start in range(0, shard_count, size)
+    ]
+
+
+def run_cluster(cluster_id, cluster_count, shard_ids, shard_count):
+    from bot import Bot
+
+    bot = Bot(
+        cluster_id=cluster_id,
+        cluster_count=cluster_count,
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+    )
+    bot.run(config.BOT_TOKEN)
+
+
+def main():
+    shard_count = config.SHARD_COUNT or asyncio.run(fetch_shard_count())
+    clusters = dict(enumerate(shard_ranges(shard_count, config.CLUSTER_COUNT)))
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+
+    def spawn(cluster_id):
+        process = context.Process(
+            target=run_cluster,
+            args=(cluster_id, len(clusters), clusters[cluster_id], shard_count),
+            name=f"cluster-{cluster_id}",
+        )
+        process.start()
+        processes[cluster_id] = process
+        print(f"Started cluster {cluster_id} with shards {clusters[cluster_id]}")
+
+    for cluster_id in clusters:
+        spawn(cluster_id)
+        time.sleep(CLUSTER_START_DELAY)
+
+    try:
+        while True:
+            time.sleep(CLUSTER_RESTART_DELAY)
+            for cluster_id, process in list(processes.items()):
+                if not process.is_alive():
+                    print(f"Cluster {cluster_id} exited ({process.exitcode})")
+                    spawn(cluster_id)
+    except KeyboardInterrupt:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
+if __name__ == "__main__":
+    main()